@@ -2,15 +2,27 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
+from .cache import AvailabilityCache, IdentityCache
+from .metrics import RequestMetrics
+from .events import EventBroker
+from .web import HttpOptimizations
+from .limits import AdmissionControl, RATE_LIMITS
+from .database import RoutingSession, SQLITE_PRAGMAS, configure_engine_options, install_profile
 import os
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
+availability_cache = AvailabilityCache()
+identity_cache = IdentityCache()
+metrics = RequestMetrics()
+events = EventBroker()
+http_optimizations = HttpOptimizations()
+admission = AdmissionControl()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     # Core config
@@ -18,6 +30,16 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///college_delivery.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Database profile: 'auto' picks sqlite or postgresql from the URL ('none' leaves the engine alone)
+    app.config.setdefault('DATABASE_PROFILE', os.environ.get('DATABASE_PROFILE', 'auto'))
+    app.config.setdefault('SQLITE_PRAGMAS', dict(SQLITE_PRAGMAS))
+    app.config.setdefault('DB_POOL_SIZE', int(os.environ.get('DB_POOL_SIZE', 10)))
+    app.config.setdefault('DB_MAX_OVERFLOW', int(os.environ.get('DB_MAX_OVERFLOW', 20)))
+    app.config.setdefault('DB_POOL_TIMEOUT', int(os.environ.get('DB_POOL_TIMEOUT', 30)))
+    app.config.setdefault('DB_POOL_RECYCLE', int(os.environ.get('DB_POOL_RECYCLE', 1800)))
+    # Read replica for dashboards and availability: a database URL, or 'local' for a second SQLite pool
+    app.config.setdefault('DATABASE_REPLICA_URL', os.environ.get('DATABASE_REPLICA_URL'))
+
     # Mail config (override via environment in production)
     app.config.setdefault('MAIL_SERVER', os.environ.get('MAIL_SERVER', 'localhost'))
     app.config.setdefault('MAIL_PORT', int(os.environ.get('MAIL_PORT', 25)))
@@ -27,18 +49,79 @@ def create_app():
     app.config.setdefault('MAIL_PASSWORD', os.environ.get('MAIL_PASSWORD'))
     app.config.setdefault('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_DEFAULT_SENDER', 'no-reply@example.com'))
 
+    # Outbox worker (scripts/mail_worker.py)
+    app.config.setdefault('MAIL_WORKERS', int(os.environ.get('MAIL_WORKERS', 2)))
+    app.config.setdefault('MAIL_BATCH_SIZE', int(os.environ.get('MAIL_BATCH_SIZE', 50)))
+    app.config.setdefault('MAIL_MAX_ATTEMPTS', int(os.environ.get('MAIL_MAX_ATTEMPTS', 5)))
+    app.config.setdefault('MAIL_RETRY_BACKOFF', int(os.environ.get('MAIL_RETRY_BACKOFF', 60)))  # seconds, doubled per attempt
+    app.config.setdefault('MAIL_REMINDER_LEAD', int(os.environ.get('MAIL_REMINDER_LEAD', 30)))  # minutes before the slot
+
+    # Availability cache (set AVAILABILITY_CACHE_REDIS_URL to share it between workers)
+    app.config.setdefault('AVAILABILITY_CACHE_SIZE', int(os.environ.get('AVAILABILITY_CACHE_SIZE', 1024)))
+    app.config.setdefault('AVAILABILITY_CACHE_TTL', int(os.environ.get('AVAILABILITY_CACHE_TTL', 30)))
+    app.config.setdefault('AVAILABILITY_CACHE_REDIS_URL', os.environ.get('AVAILABILITY_CACHE_REDIS_URL'))
+
+    # Live streams (Server-Sent Events); shared across workers through Redis (defaults to the cache's)
+    app.config.setdefault('EVENTS_REDIS_URL', os.environ.get('EVENTS_REDIS_URL'))
+    app.config.setdefault('EVENTS_STREAM_SECONDS', int(os.environ.get('EVENTS_STREAM_SECONDS', 300)))  # clients reconnect after this
+
+    # Signed-in user cache for load_user (keep the TTL short) and password hashing cost
+    app.config.setdefault('IDENTITY_CACHE_TTL', int(os.environ.get('IDENTITY_CACHE_TTL', 60)))
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+
+    # Group commit (app/writer.py): one writer thread per process commits the bookings that arrive
+    # within BOOKING_GROUP_WINDOW seconds in one transaction
+    app.config.setdefault('BOOKING_GROUP_COMMIT', os.environ.get('BOOKING_GROUP_COMMIT', 'false').lower() == 'true')
+    app.config.setdefault('BOOKING_GROUP_WINDOW', float(os.environ.get('BOOKING_GROUP_WINDOW', 0.002)))
+    app.config.setdefault('BOOKING_GROUP_SIZE', int(os.environ.get('BOOKING_GROUP_SIZE', 64)))
+
+    # How long a seat stays held for a student filling in the booking form
+    app.config.setdefault('HOLD_SECONDS', int(os.environ.get('HOLD_SECONDS', 300)))
+
+    # Admission control: token buckets per user and overall (RATE_LIMITS), shared through Redis if set,
+    # then at most BOOKING_WORKERS bookings at once with BOOKING_QUEUE_SIZE more waiting (0 workers: no queue)
+    app.config.setdefault('RATE_LIMIT_ENABLED', os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true')
+    app.config.setdefault('RATE_LIMITS', dict(RATE_LIMITS))
+    app.config.setdefault('RATE_LIMIT_REDIS_URL', os.environ.get('RATE_LIMIT_REDIS_URL'))
+    app.config.setdefault('BOOKING_WORKERS', int(os.environ.get('BOOKING_WORKERS', 4)))
+    app.config.setdefault('BOOKING_QUEUE_SIZE', int(os.environ.get('BOOKING_QUEUE_SIZE', 16)))
+    app.config.setdefault('BOOKING_QUEUE_TIMEOUT', float(os.environ.get('BOOKING_QUEUE_TIMEOUT', 2)))  # seconds
+
+    # Finished orders booked more than ORDER_ARCHIVE_DAYS ago move to order_archive (scripts/archive_orders.py)
+    app.config.setdefault('ORDER_ARCHIVE_DAYS', int(os.environ.get('ORDER_ARCHIVE_DAYS', 90)))
+    app.config.setdefault('ORDER_ARCHIVE_BATCH_SIZE', int(os.environ.get('ORDER_ARCHIVE_BATCH_SIZE', 1000)))
+
+    # Rows per committed batch in migration backfills (python migrate.py)
+    app.config.setdefault('MIGRATION_BATCH_SIZE', int(os.environ.get('MIGRATION_BATCH_SIZE', 1000)))
+
+    # Compression of large HTML/JSON responses (brotli if installed, else gzip)
+    app.config.setdefault('COMPRESS_ENABLED', os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true')
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', 1024)))
+
+    # Request metrics (/admin/metrics); debug headers add Server-Timing to every response
+    app.config.setdefault('METRICS_SLOW_QUERY_MS', int(os.environ.get('METRICS_SLOW_QUERY_MS', 100)))
+    app.config.setdefault('METRICS_DEBUG_HEADERS', os.environ.get('METRICS_DEBUG_HEADERS', 'false').lower() == 'true')
+
+    # Explicit overrides (scripts, benchmarks)
+    if config:
+        app.config.update(config)
+
     # Init extensions
+    configure_engine_options(app)
     db.init_app(app)
+    install_profile(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
     mail.init_app(app)
+    availability_cache.init_app(app)
+    identity_cache.init_app(app)
+    metrics.init_app(app)
+    events.init_app(app)
+    http_optimizations.init_app(app)
+    admission.init_app(app)
 
     # Register blueprints
     from .routes import bp as main_bp
     app.register_blueprint(main_bp)
 
-    # Create DB tables on first run
-    with app.app_context():
-        db.create_all()
-
     return app
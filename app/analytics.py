@@ -0,0 +1,123 @@
+"""Slot utilization, no-show rates and partner volume for the analytics pages.
+
+Every figure comes from ``order_rollup`` (one row per slot, date and status)
+plus the small ``time_slot`` and ``partner`` tables for capacity and names,
+so the pages cost the same however many orders exist. Utilization is seats
+taken (booked or completed) over the capacity each slot offered in the range;
+a no-show is an order still 'Booked' after its date has passed.
+"""
+from datetime import date, timedelta
+from sqlalchemy import case, func, select
+from . import db
+from .booking import ACTIVE_STATUSES
+from .models import OrderRollup, Partner, TimeSlot
+from .slot_templates import DAYS
+
+
+rollup = OrderRollup.__table__
+
+# Longest range the analytics pages cover
+MAX_WEEKS = 52
+
+
+def week_range(weeks, today=None):
+    """Monday ``weeks - 1`` weeks before this week through this week's Sunday."""
+    today = today or date.today()
+    weeks = max(1, min(weeks, MAX_WEEKS))
+    monday = today - timedelta(days=today.weekday())
+    return monday - timedelta(weeks=weeks - 1), monday + timedelta(days=6)
+
+
+def _share(part, whole):
+    return round(100 * part / whole, 1) if whole else None
+
+
+def utilization(start, end, partner_id=None):
+    """Seats taken against capacity, as a weekday x start-time heatmap and a weekly series.
+
+    Returns ``{'days', 'rows', 'weeks'}``: each row is a start time with a
+    percentage per weekday (None where no slot runs), each week has its
+    seats taken, capacity and percentage. Seats are summed in SQL per slot and
+    per date; capacity follows from how often each weekday falls in the range.
+    """
+    slots = select(TimeSlot.id, TimeSlot.day_of_week, TimeSlot.start_time, TimeSlot.start_minute,
+                   TimeSlot.max_capacity)
+    active = (rollup.c.booking_date.between(start, end), rollup.c.status.in_(ACTIVE_STATUSES))
+    by_slot = select(rollup.c.time_slot_id, func.sum(rollup.c.orders)).where(*active).group_by(rollup.c.time_slot_id)
+    by_date = select(rollup.c.booking_date, func.sum(rollup.c.orders)).where(*active).group_by(rollup.c.booking_date)
+    if partner_id is not None:
+        slots = slots.where(TimeSlot.partner_id == partner_id)
+        by_slot = by_slot.where(rollup.c.partner_id == partner_id)
+        by_date = by_date.where(rollup.c.partner_id == partner_id)
+    slots = db.session.execute(slots).all()
+    slot_seats = dict(db.session.execute(by_slot).all())
+    date_seats = dict(db.session.execute(by_date).all())
+
+    occurrences = dict.fromkeys(DAYS, 0)
+    day = start
+    while day <= end:
+        occurrences[DAYS[day.weekday()]] += 1
+        day += timedelta(days=1)
+
+    cells, times, daily_capacity = {}, {}, dict.fromkeys(DAYS, 0)
+    for slot_id, weekday, start_time, start_minute, capacity in slots:
+        times.setdefault(start_time, start_minute)
+        cell = cells.setdefault((start_time, weekday), [0, 0])
+        cell[0] += slot_seats.get(slot_id, 0)
+        cell[1] += capacity * occurrences[weekday]
+        daily_capacity[weekday] += capacity
+
+    weeks = {}
+    day = start
+    while day <= end:
+        week = weeks.setdefault(day - timedelta(days=day.weekday()), [0, 0])
+        week[0] += date_seats.get(day, 0)
+        week[1] += daily_capacity[DAYS[day.weekday()]]
+        day += timedelta(days=1)
+
+    rows = [
+        {'start_time': start_time,
+         'cells': {weekday: _share(*cells[(start_time, weekday)]) if (start_time, weekday) in cells else None
+                   for weekday in DAYS}}
+        for start_time in sorted(times, key=lambda t: times[t])
+    ]
+    return {
+        'days': DAYS,
+        'rows': rows,
+        'weeks': [{'start': monday, 'taken': n, 'capacity': capacity, 'rate': _share(n, capacity)}
+                  for monday, (n, capacity) in sorted(weeks.items())],
+    }
+
+
+def partner_volume(start, end, partner_id=None, today=None):
+    """Orders per partner and status in the range, with each partner's no-show rate.
+
+    One grouped query; the no-show rate is past 'Booked' orders over past
+    booked and completed ones. Busiest partners first.
+    """
+    today = today or date.today()
+    past = case((rollup.c.booking_date < today, True), else_=False)
+    query = (
+        select(rollup.c.partner_id, rollup.c.status, past, func.sum(rollup.c.orders))
+        .where(rollup.c.booking_date.between(start, end))
+        .group_by(rollup.c.partner_id, rollup.c.status, past)
+    )
+    if partner_id is not None:
+        query = query.where(rollup.c.partner_id == partner_id)
+
+    volume = {}
+    for pid, status, is_past, n in db.session.execute(query):
+        entry = volume.setdefault(pid, {'partner_id': pid, 'statuses': {}, 'total': 0, 'past': {}})
+        entry['statuses'][status] = entry['statuses'].get(status, 0) + n
+        entry['total'] += n
+        if is_past:
+            entry['past'][status] = n
+    names = dict(db.session.execute(
+        select(Partner.id, Partner.platform_name).where(Partner.id.in_(list(volume)))).all()) if volume else {}
+    for entry in volume.values():
+        past_orders = entry.pop('past')
+        no_shows = past_orders.get('Booked', 0)
+        entry['platform_name'] = names.get(entry['partner_id'], f"#{entry['partner_id']}")
+        entry['no_shows'] = no_shows
+        entry['no_show_rate'] = _share(no_shows, no_shows + past_orders.get('Completed', 0))
+    return sorted(volume.values(), key=lambda entry: -entry['total'])
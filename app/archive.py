@@ -0,0 +1,78 @@
+"""Hot/cold split of the order table.
+
+``archive_orders`` moves Completed and Cancelled orders whose booking date is
+older than ``ORDER_ARCHIVE_DAYS`` into ``order_archive``, a batch at a time
+(copy and delete in one transaction per batch), so ``order`` and its indexes
+only hold the working set: upcoming bookings and recent history. Capacity
+checks only look at live orders; user history and exports read both tables
+through ``OrderHistory``. The newest order always stays live: SQLite hands
+out ``max(id) + 1`` for new rows, so archiving it would let the next booking
+reuse an archived id.
+"""
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select, update
+from . import db
+from .models import ORDER_COLUMNS, Order, OrderArchive, OutboxMessage
+
+
+# Only finished orders leave the hot table
+ARCHIVE_STATUSES = ('Completed', 'Cancelled')
+
+
+def archive_cutoff(today=None):
+    """Booking dates before this are archived (never later than yesterday)."""
+    days = max(current_app.config['ORDER_ARCHIVE_DAYS'], 1)
+    return (today or date.today()) - timedelta(days=days)
+
+
+def archive_orders(before=None, batch_size=None, limit=None, progress=None):
+    """Move finished orders booked before ``before`` (default ``archive_cutoff()``) to the archive.
+
+    Walks ``order`` by id in batches of ``batch_size`` (ORDER_ARCHIVE_BATCH_SIZE)
+    and commits each one, so locks stay short and an interrupted run loses
+    nothing. ``limit`` caps the rows moved in this run. The order with the
+    highest id is never moved. Returns the count moved.
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or current_app.config['ORDER_ARCHIVE_BATCH_SIZE']
+    progress = progress or (lambda message: None)
+    order = Order.__table__
+    columns = [order.c[c] for c in ORDER_COLUMNS]
+    # Keeps new ids above every archived one on databases without sequences
+    newest = db.session.scalar(select(func.max(order.c.id)))
+    if newest is None:
+        return 0
+    started = time.monotonic()
+    moved, last_id = 0, 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        ids = list(db.session.scalars(
+            select(order.c.id)
+            .where(order.c.id > last_id, order.c.id < newest, order.c.status.in_(ARCHIVE_STATUSES), order.c.booking_date < before)
+            .order_by(order.c.id).limit(size)
+        ))
+        if not ids:
+            break
+        now = datetime.utcnow()
+        db.session.execute(insert(OrderArchive.__table__).from_select(
+            [*ORDER_COLUMNS, 'archived_at'],
+            select(*columns, literal(now)).where(order.c.id.in_(ids)),
+        ))
+        # Sent long ago; keep the messages but drop the reference to the live row
+        db.session.execute(
+            update(OutboxMessage.__table__).where(OutboxMessage.order_id.in_(ids)).values(order_id=None))
+        db.session.execute(delete(order).where(order.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+        last_id = ids[-1]
+        progress(f'archived {moved} orders ({moved / max(time.monotonic() - started, 1e-6):,.0f}/s)')
+    return moved
+
+
+
+def reused_ids():
+    """Archived orders whose id is not below the newest live one; new bookings may collide with them."""
+    newest = db.session.scalar(select(func.max(Order.id))) or 0
+    return db.session.scalar(select(func.count()).select_from(OrderArchive).where(OrderArchive.id >= newest))
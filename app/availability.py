@@ -0,0 +1,169 @@
+"""Remaining slot capacity, computed with grouped aggregates instead of per-slot counts.
+
+Seats on live holds (``SlotHold``) count as taken, like booked orders.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, select
+from . import db, availability_cache, events
+from .booking import ACTIVE_STATUSES
+from .models import Order, SlotHold, TimeSlot
+from .slots import within_window
+
+
+def slot_availability(partner_id, booking_date, from_minute=None, to_minute=None):
+    """A partner's slots for ``booking_date`` with their remaining capacity, earliest first.
+
+    One query: the partner's slots for that weekday (optionally only those
+    inside a [from_minute, to_minute] window) LEFT JOINed to the orders booked
+    into them on that date, grouped by slot and ordered by start time; live
+    holds are counted by a correlated subquery on the same row.
+    """
+    booked = func.count(Order.id)
+    held = (
+        select(func.count()).where(SlotHold.time_slot_id == TimeSlot.id, SlotHold.booking_date == booking_date,
+                                   SlotHold.expires_at > datetime.utcnow())
+        .correlate(TimeSlot).scalar_subquery()
+    )
+    query = (
+        select(TimeSlot.id, TimeSlot.start_time, TimeSlot.end_time, TimeSlot.start_minute,
+               TimeSlot.end_minute, TimeSlot.max_capacity, booked + held)
+        .outerjoin(Order, and_(
+            Order.time_slot_id == TimeSlot.id,
+            Order.booking_date == booking_date,
+            Order.status.in_(ACTIVE_STATUSES),
+        ))
+        .where(TimeSlot.partner_id == partner_id, TimeSlot.day_of_week == booking_date.strftime('%A'))
+        .group_by(TimeSlot.id, TimeSlot.start_time, TimeSlot.end_time, TimeSlot.start_minute,
+                  TimeSlot.end_minute, TimeSlot.max_capacity)
+        .order_by(TimeSlot.start_minute, TimeSlot.id)
+    )
+    rows = db.session.execute(within_window(query, from_minute, to_minute))
+    return [
+        {
+            'id': slot_id,
+            'start_time': start_time,
+            'end_time': end_time,
+            'start_minute': start_minute,
+            'end_minute': end_minute,
+            'max_capacity': max_capacity,
+            'available_capacity': max(max_capacity - booked_count, 0),
+        }
+        for slot_id, start_time, end_time, start_minute, end_minute, max_capacity, booked_count in rows
+    ]
+
+
+def cached_slot_availability(partner_id, booking_date):
+    """``slot_availability`` served from the availability cache when possible."""
+    slots = availability_cache.get(partner_id, booking_date)
+    if slots is None:
+        generation = availability_cache.generation(partner_id)
+        slots = slot_availability(partner_id, booking_date)
+        availability_cache.set(partner_id, booking_date, slots, generation)
+    return slots
+
+
+def availability_channel(partner_id, booking_date=None):
+    """Event channel for one partner-date, or for changes to all of a partner's dates."""
+    return f'availability:{partner_id}:{booking_date.isoformat()}' if booking_date else f'availability:{partner_id}'
+
+
+def availability_changed(partner_id, booking_date=None):
+    """Call after committing a change to a partner's slots or bookings.
+
+    Pass ``booking_date`` when only that date is affected; without it every
+    cached date for the partner is dropped (slot created or deleted). Open
+    availability streams are notified either way.
+    """
+    availability_cache.invalidate(partner_id, booking_date)
+    if booking_date is None:
+        events.publish(availability_channel(partner_id))
+        return
+    # Recomputed once here (and re-cached) so the open streams need no query of their own
+    slots = cached_slot_availability(partner_id, booking_date)
+    events.publish(availability_channel(partner_id, booking_date), date=booking_date.isoformat(),
+                   remaining={str(slot['id']): slot['available_capacity'] for slot in slots})
+
+
+def held_seats(slot_ids, start, end):
+    """Seats on live holds per (slot_id, booking_date), for dates in ``[start, end]``."""
+    if not slot_ids:
+        return {}
+    rows = db.session.execute(
+        select(SlotHold.time_slot_id, SlotHold.booking_date, func.count())
+        .where(SlotHold.time_slot_id.in_(slot_ids), SlotHold.booking_date.between(start, end),
+               SlotHold.expires_at > datetime.utcnow())
+        .group_by(SlotHold.time_slot_id, SlotHold.booking_date)
+    )
+    return {(slot_id, day): n for slot_id, day, n in rows}
+
+
+# Longest range /api/availability will answer in one request
+MAX_CALENDAR_DAYS = 14
+
+
+def availability_calendar(partner_id, start, end, from_minute=None, to_minute=None):
+    """Remaining capacity for every slot on every date in ``[start, end]``.
+
+    One query groups the partner's orders in the range by slot and date and a
+    second adds live holds; the date x slot grid is then filled in from the
+    weekday each slot repeats on.
+    Returns ``(slots, grid)`` where ``grid`` maps ISO dates to ``{slot_id: remaining}``.
+    """
+    booked = func.count(Order.id)
+    query = (
+        select(TimeSlot.id, TimeSlot.day_of_week, TimeSlot.start_time, TimeSlot.end_time,
+               TimeSlot.max_capacity, Order.booking_date, booked)
+        .outerjoin(Order, and_(
+            Order.time_slot_id == TimeSlot.id,
+            Order.booking_date.between(start, end),
+            Order.status.in_(ACTIVE_STATUSES),
+        ))
+        .where(TimeSlot.partner_id == partner_id)
+        .group_by(TimeSlot.id, TimeSlot.day_of_week, TimeSlot.start_time, TimeSlot.end_time,
+                  TimeSlot.max_capacity, TimeSlot.start_minute, Order.booking_date)
+        .order_by(TimeSlot.start_minute, TimeSlot.id)
+    )
+    rows = db.session.execute(within_window(query, from_minute, to_minute))
+
+    slots = {}
+    counts = {}
+    for slot_id, day_of_week, start_time, end_time, max_capacity, booking_date, booked_count in rows:
+        slots.setdefault(slot_id, {
+            'id': slot_id,
+            'day_of_week': day_of_week,
+            'start_time': start_time,
+            'end_time': end_time,
+            'max_capacity': max_capacity,
+        })
+        if booking_date is not None:
+            counts[(slot_id, booking_date)] = booked_count
+    for key, n in held_seats(list(slots), start, end).items():
+        counts[key] = counts.get(key, 0) + n
+
+    grid = {}
+    day = start
+    while day <= end:
+        weekday = day.strftime('%A')
+        grid[day.isoformat()] = {
+            slot['id']: max(slot['max_capacity'] - counts.get((slot['id'], day), 0), 0)
+            for slot in slots.values() if slot['day_of_week'] == weekday
+        }
+        day += timedelta(days=1)
+    return list(slots.values()), grid
+
+
+def next_available(slots, grid):
+    """The earliest (date, slot) in ``grid`` that still has room, or None."""
+    by_id = {slot['id']: slot for slot in slots}
+    for day, remaining in grid.items():
+        for slot_id, seats in remaining.items():
+            if seats > 0:
+                slot = by_id[slot_id]
+                return {
+                    'date': day,
+                    'slot_id': slot_id,
+                    'start_time': slot['start_time'],
+                    'end_time': slot['end_time'],
+                    'available_capacity': seats,
+                }
+    return None
@@ -0,0 +1,195 @@
+"""Slot reservation engine.
+
+Capacity is claimed with a single conditional UPDATE on ``slot_booking_counter``
+so concurrent bookings for the same slot and date can never overbook it, and
+handed back when orders are cancelled. ``order_rollup`` is kept in step in the
+same transactions.
+"""
+from collections import Counter, defaultdict
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+from .models import Order, OrderRollup, SlotBookingCounter, TimeSlot, order_history
+
+
+counter = SlotBookingCounter.__table__
+rollup = OrderRollup.__table__
+
+STATUSES = ('Booked', 'Completed', 'Cancelled')
+
+# Orders in these states hold a seat in their slot
+ACTIVE_STATUSES = ('Booked', 'Completed')
+
+# Only booked orders can move; completed and cancelled are final
+TRANSITIONS = {'Booked': ('Completed', 'Cancelled')}
+
+
+def _insert_ignore(table):
+    """INSERT that silently skips rows whose primary key already exists."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return insert(table).prefix_with('IGNORE')  # MySQL / MariaDB
+
+
+def ensure_counter(slot_id, booking_date):
+    """Create the counter row for (slot, date) if missing, seeded from existing orders."""
+    seed = select(
+        literal(slot_id, type_=db.Integer),
+        literal(booking_date, type_=db.Date),
+        func.count(Order.id),
+    ).where(
+        Order.time_slot_id == slot_id,
+        Order.booking_date == booking_date,
+        Order.status.in_(ACTIVE_STATUSES),
+    )
+    db.session.execute(
+        _insert_ignore(counter).from_select(['time_slot_id', 'booking_date', 'booked'], seed)
+    )
+
+
+def rebuild_counters(since=None):
+    """Recompute counter rows from the orders table, for dates from ``since`` on (all if None).
+
+    For bulk loads and repairs; the caller commits.
+    """
+    cleared, dated = delete(counter), []
+    if since is not None:
+        cleared, dated = cleared.where(counter.c.booking_date >= since), [Order.booking_date >= since]
+    db.session.execute(cleared)
+    db.session.execute(insert(counter).from_select(
+        ['time_slot_id', 'booking_date', 'booked'],
+        select(Order.time_slot_id, Order.booking_date, func.count(Order.id))
+        .where(Order.status.in_(ACTIVE_STATUSES), *dated)
+        .group_by(Order.time_slot_id, Order.booking_date),
+    ))
+
+
+def reserve_slot(slot_id, booking_date, seats=1):
+    """Claim ``seats`` in a slot for a date inside the current transaction.
+
+    Returns True when capacity was claimed. The caller commits (together with
+    the order insert) or rolls back; a rollback releases the claim.
+    """
+    ensure_counter(slot_id, booking_date)
+    capacity = select(TimeSlot.max_capacity).where(TimeSlot.id == slot_id).scalar_subquery()
+    result = db.session.execute(
+        update(counter)
+        .where(
+            counter.c.time_slot_id == slot_id,
+            counter.c.booking_date == booking_date,
+            counter.c.booked + seats <= capacity,
+        )
+        .values(booked=counter.c.booked + seats)
+    )
+    return result.rowcount == 1
+
+
+def release_seats(released):
+    """Give back seats: ``released`` maps (slot_id, booking_date) to a seat count."""
+    if not released:
+        return
+    seats = bindparam('seats')
+    db.session.execute(
+        update(counter)
+        .where(counter.c.time_slot_id == bindparam('slot_id'), counter.c.booking_date == bindparam('day'))
+        .values(booked=case((counter.c.booked > seats, counter.c.booked - seats), else_=0)),
+        [{'slot_id': slot_id, 'day': day, 'seats': n} for (slot_id, day), n in released.items()],
+    )
+
+
+def count_orders(changes):
+    """Apply order count changes to the rollup: ``changes`` maps (partner_id, slot_id, date, status) to +/-n."""
+    changes = [(key, n) for key, n in changes.items() if n]
+    if not changes:
+        return
+    db.session.execute(_insert_ignore(rollup), [
+        {'partner_id': partner_id, 'time_slot_id': slot_id, 'booking_date': day, 'status': status, 'orders': 0}
+        for (partner_id, slot_id, day, status), _ in changes
+    ])
+    db.session.execute(
+        update(rollup)
+        .where(rollup.c.partner_id == bindparam('p'), rollup.c.time_slot_id == bindparam('slot_id'),
+               rollup.c.booking_date == bindparam('day'), rollup.c.status == bindparam('st'))
+        .values(orders=rollup.c.orders + bindparam('n')),
+        [{'p': partner_id, 'slot_id': slot_id, 'day': day, 'st': status, 'n': n}
+         for (partner_id, slot_id, day, status), n in changes],
+    )
+
+
+def rebuild_rollups(since=None):
+    """Recompute the rollup from live and archived orders, for dates from ``since`` on (all if None).
+
+    For backfills, bulk loads and repairs; the caller commits.
+    """
+    cleared, dated = delete(rollup), []
+    if since is not None:
+        cleared, dated = cleared.where(rollup.c.booking_date >= since), [order_history.c.booking_date >= since]
+    db.session.execute(cleared)
+    keys = (order_history.c.partner_id, order_history.c.time_slot_id, order_history.c.booking_date,
+            order_history.c.status)
+    db.session.execute(insert(rollup).from_select(
+        ['partner_id', 'time_slot_id', 'booking_date', 'status', 'orders'],
+        select(*keys, func.count()).where(*dated).group_by(*keys),
+    ))
+
+
+def bulk_set_status(status, *, partner_id=None, user_id=None, order_ids=None, slot_id=None,
+                    booking_date=None, date_from=None, date_to=None, type_=None):
+    """Move every matching 'Booked' order to ``status`` with one set-based UPDATE.
+
+    ``partner_id`` / ``user_id`` scope the change to one partner or student;
+    at least one selector (order ids, slot, dates or type) must narrow it
+    further. Cancelling hands the seats back to each slot in the same
+    transaction and the rollup follows. The caller commits. Returns ``(updated, touched)`` where
+    ``touched`` maps (partner_id, booking_date) to the ids of the orders moved.
+    """
+    if status not in TRANSITIONS['Booked']:
+        raise ValueError(f'Orders can only be moved to {" or ".join(TRANSITIONS["Booked"])}')
+    conditions = [Order.status == 'Booked']
+    if partner_id is not None:
+        conditions.append(Order.partner_id == partner_id)
+    if user_id is not None:
+        conditions.append(Order.user_id == user_id)
+    selectors = []
+    if order_ids is not None:
+        selectors.append(Order.id.in_(order_ids))
+    if slot_id is not None:
+        selectors.append(Order.time_slot_id == slot_id)
+    if booking_date is not None:
+        selectors.append(Order.booking_date == booking_date)
+    if date_from is not None:
+        selectors.append(Order.booking_date >= date_from)
+    if date_to is not None:
+        selectors.append(Order.booking_date <= date_to)
+    if type_ is not None:
+        selectors.append(Order.type == type_)
+    if not selectors:
+        raise ValueError('Select orders by id, slot, date or type')
+
+    stmt = update(Order).values(status=status).execution_options(synchronize_session=False)
+    if db.session.get_bind().dialect.update_returning:
+        moved = db.session.execute(stmt.where(*conditions, *selectors).returning(
+            Order.id, Order.partner_id, Order.time_slot_id, Order.booking_date)).all()
+    else:
+        # Lock the rows found, then update exactly those, so seats and rollup match what changed
+        moved = db.session.execute(
+            select(Order.id, Order.partner_id, Order.time_slot_id, Order.booking_date)
+            .where(*conditions, *selectors).with_for_update()
+        ).all()
+        if moved:
+            db.session.execute(stmt.where(Order.id.in_([row.id for row in moved]), Order.status == 'Booked'))
+
+    if status == 'Cancelled':
+        release_seats(Counter((slot, day) for _, _, slot, day in moved))
+    moves = Counter()
+    for _, partner, slot, day in moved:
+        moves[(partner, slot, day, 'Booked')] -= 1
+        moves[(partner, slot, day, status)] += 1
+    count_orders(moves)
+    touched = defaultdict(list)
+    for order_id, partner, _, day in moved:
+        touched[(partner, day)].append(order_id)
+    return len(moved), dict(touched)
@@ -0,0 +1,275 @@
+"""Small caches for read-mostly data (slot availability, signed-in users)."""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import current_app
+
+
+class LocalCache:
+    """Thread-safe LRU cache with a per-entry TTL, private to one worker process.
+
+    Keys are ``(namespace, item)`` tuples so a whole namespace can be dropped at
+    once. Each namespace carries a generation number that ``invalidate`` bumps;
+    ``set`` refuses values computed under an older generation, so a reader that
+    raced a write can never put stale data back into the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._generations = {}
+        self._changed_at = {}
+        self._lock = threading.Lock()
+        # Generations are per process; the token keeps two workers' versions from colliding
+        self._token = uuid.uuid4().hex[:8]
+        self._started_at = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def get(self, namespace, item):
+        key = (namespace, item)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, namespace, item, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(namespace, 0):
+                return
+            self._data[(namespace, item)] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end((namespace, item))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def version(self, namespace):
+        """``(tag, changed_at)`` identifying the namespace's current data.
+
+        Other workers' writes are invisible here, so the tag also rolls over
+        every ``ttl`` seconds: the same staleness bound the cached values have.
+        """
+        period = self.ttl or 1
+        bucket = int(time.time() // period)
+        with self._lock:
+            generation = self._generations.get(namespace, 0)
+            changed_at = self._changed_at.get(namespace, self._started_at)
+        return f'{self._token}.{generation}.{bucket}', max(changed_at, bucket * period)
+
+    def invalidate(self, namespace, item=None):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._changed_at[namespace] = time.time()
+            if item is not None:
+                self._data.pop((namespace, item), None)
+            else:
+                for key in [k for k in self._data if k[0] == namespace]:
+                    del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'local',
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+# KEYS[1] namespace hash, KEYS[2] its version hash; ARGV item, entry, ttl, generation.
+# Writes only if the namespace has not been invalidated since the value was computed.
+_SET_SCRIPT = """
+if (redis.call('HGET', KEYS[2], 'n') or '0') ~= ARGV[4] then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+
+class RedisCache:
+    """Cache shared by every worker, stored as one Redis hash per namespace.
+
+    Entries expire after ``ttl`` seconds; invalidation deletes the field (or
+    the whole hash) and bumps the namespace's version counter, so all workers
+    see it on their next read. Like ``LocalCache``, ``set`` with a generation
+    refuses values computed before the latest invalidation.
+    """
+
+    def __init__(self, url, ttl=30, prefix='cache'):
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError('AVAILABILITY_CACHE_REDIS_URL is set but the redis package is not installed') from exc
+        self._redis = redis.Redis.from_url(url)
+        self._set_current = self._redis.register_script(_SET_SCRIPT)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._started_at = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, namespace):
+        return f'{self.prefix}:{namespace}'
+
+    def generation(self, namespace):
+        counter = self._redis.hget(self._version_key(namespace), 'n')
+        return int(counter) if counter is not None else 0
+
+    def version(self, namespace):
+        """``(tag, changed_at)`` shared by every worker; bumped by ``invalidate``.
+
+        Data can also change without an invalidation (a seat hold expiring),
+        so the tag rolls over every ``ttl`` seconds like the cached values do.
+        """
+        period = self.ttl or 1
+        bucket = int(time.time() // period)
+        counter, changed_at = self._redis.hmget(self._version_key(namespace), 'n', 'at')
+        if counter is None:
+            return f'0.{bucket}', max(self._started_at, bucket * period)
+        return f'{counter.decode()}.{bucket}', max(float(changed_at), bucket * period)
+
+    def _version_key(self, namespace):
+        return f'{self.prefix}:version:{namespace}'
+
+    def _bump(self, pipe, namespace):
+        pipe.hincrby(self._version_key(namespace), 'n', 1)
+        pipe.hset(self._version_key(namespace), 'at', time.time())
+
+    def get(self, namespace, item):
+        raw = self._redis.hget(self._key(namespace), str(item))
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry['expires'] >= time.time():
+                self.hits += 1
+                return entry['value']
+        self.misses += 1
+        return None
+
+    def set(self, namespace, item, value, generation=None):
+        key = self._key(namespace)
+        entry = json.dumps({'expires': time.time() + self.ttl, 'value': value})
+        if generation is not None:
+            self._set_current(keys=[key, self._version_key(namespace)],
+                              args=[str(item), entry, self.ttl, generation])
+            return
+        pipe = self._redis.pipeline()
+        pipe.hset(key, str(item), entry)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, namespace, item=None):
+        pipe = self._redis.pipeline()
+        if item is None:
+            pipe.delete(self._key(namespace))
+        else:
+            pipe.hdel(self._key(namespace), str(item))
+        self._bump(pipe, namespace)
+        pipe.execute()
+
+    def stats(self):
+        return {'backend': 'redis', 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+def _make_backend(redis_url, maxsize, ttl, prefix):
+    if redis_url:
+        return RedisCache(redis_url, ttl=ttl, prefix=prefix)
+    return LocalCache(maxsize=maxsize, ttl=ttl)
+
+
+class AvailabilityCache:
+    """Flask extension caching per-(partner, date) slot availability."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AVAILABILITY_CACHE_SIZE', 1024)
+        app.config.setdefault('AVAILABILITY_CACHE_TTL', 30)
+        app.config.setdefault('AVAILABILITY_CACHE_REDIS_URL', None)
+        app.extensions['availability_cache'] = _make_backend(
+            app.config['AVAILABILITY_CACHE_REDIS_URL'], app.config['AVAILABILITY_CACHE_SIZE'],
+            app.config['AVAILABILITY_CACHE_TTL'], 'availability',
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions['availability_cache']
+
+    def generation(self, partner_id):
+        return self.backend.generation(partner_id)
+
+    def get(self, partner_id, booking_date):
+        return self.backend.get(partner_id, booking_date.isoformat())
+
+    def set(self, partner_id, booking_date, value, generation=None):
+        self.backend.set(partner_id, booking_date.isoformat(), value, generation)
+
+    def invalidate(self, partner_id, booking_date=None):
+        self.backend.invalidate(partner_id, booking_date.isoformat() if booking_date else None)
+
+    def version(self, partner_id):
+        """Cheap stamp of a partner's availability: ``(tag, changed_at)``, changed by ``invalidate``."""
+        return self.backend.version(partner_id)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+class IdentityCache:
+    """Flask extension caching the user columns ``load_user`` needs, per user id.
+
+    The TTL is kept short: it bounds how long another worker process may keep
+    serving a changed user when the local (per-process) backend is used.
+    """
+
+    namespace = 'user'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 4096)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+        app.config.setdefault('IDENTITY_CACHE_REDIS_URL', app.config.get('AVAILABILITY_CACHE_REDIS_URL'))
+        app.extensions['identity_cache'] = _make_backend(
+            app.config['IDENTITY_CACHE_REDIS_URL'], app.config['IDENTITY_CACHE_SIZE'],
+            app.config['IDENTITY_CACHE_TTL'], 'identity',
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions['identity_cache']
+
+    def generation(self):
+        return self.backend.generation(self.namespace)
+
+    def get(self, user_id):
+        return self.backend.get(self.namespace, user_id)
+
+    def set(self, user_id, value, generation=None):
+        self.backend.set(self.namespace, user_id, value, generation)
+
+    def invalidate(self, user_id):
+        self.backend.invalidate(self.namespace, user_id)
+
+    def stats(self):
+        return self.backend.stats()
@@ -0,0 +1,26 @@
+"""Conversions between slot display times ('9:00 AM') and minutes since midnight."""
+import re
+
+
+_CLOCK = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$')
+
+
+def parse_clock(value):
+    """Minutes since midnight for '9:00 AM', '9 AM', '09:00' or '21:30'; ValueError otherwise."""
+    match = _CLOCK.match(value or '')
+    if not match:
+        raise ValueError(f'Unrecognised time: {value!r}')
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f'Unrecognised time: {value!r}')
+        hour = hour % 12 + (12 if meridiem.upper() == 'PM' else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        raise ValueError(f'Unrecognised time: {value!r}')
+    return hour * 60 + minute
+
+
+def format_clock(minutes):
+    """Display string in the seeded style, e.g. 540 -> '9:00 AM'."""
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
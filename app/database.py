@@ -0,0 +1,146 @@
+"""Database profiles and read-replica routing.
+
+``configure_engine_options`` runs before ``db.init_app`` and fills in pool
+settings for the selected profile; ``install_profile`` runs after it and
+hooks the SQLite pragmas onto every new connection. When a ``replica`` bind
+is configured, views wrapped in ``replica_reads`` send their SELECTs to it
+while flushes and writes keep going to the primary.
+"""
+from contextlib import contextmanager
+from functools import wraps
+from flask import request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+
+# Applied on every new SQLite connection; override with SQLITE_PRAGMAS
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers no longer block the booking writer
+    'synchronous': 'NORMAL',  # safe with WAL, far fewer fsyncs
+    'busy_timeout': 5000,  # wait up to 5 s for the write lock instead of "database is locked"
+    'mmap_size': 268435456,
+    'cache_size': -65536,  # KiB, i.e. 64 MB
+}
+
+REPLICA_BIND = 'replica'
+
+
+def profile_for(url):
+    if url.startswith('sqlite'):
+        return 'sqlite'
+    if url.startswith(('postgresql', 'postgres')):
+        return 'postgresql'
+    return 'default'
+
+
+def configure_engine_options(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS (and the replica bind) for DATABASE_PROFILE.
+
+    Options already set explicitly are kept.
+    """
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    if url.startswith('postgres://'):
+        # Hosting providers still hand out the scheme SQLAlchemy dropped
+        url = app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://' + url[len('postgres://'):]
+    profile = app.config.get('DATABASE_PROFILE') or 'auto'
+    if profile == 'auto':
+        profile = profile_for(url)
+    app.config['DATABASE_PROFILE'] = profile
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if profile == 'sqlite':
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('timeout', app.config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000)
+        options['connect_args'] = connect_args
+        # One busy timeout: an explicit connect timeout (e.g. a benchmark's) wins over the pragma default
+        app.config['SQLITE_PRAGMAS'] = dict(app.config['SQLITE_PRAGMAS'], busy_timeout=int(connect_args['timeout'] * 1000))
+    elif profile == 'postgresql':
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', True)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    replica = app.config.get('DATABASE_REPLICA_URL')
+    if replica:
+        if replica == 'local':
+            # A second pool of read-only connections to the primary database (SQLite)
+            replica = url
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND, replica)
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def _sqlite_pragmas(pragmas, read_only=False):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if read_only and name == 'journal_mode':
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return on_connect
+
+
+def install_profile(app, db):
+    """Hook per-connection settings onto the app's engines; call after ``db.init_app``."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite' and app.config['DATABASE_PROFILE'] == 'sqlite':
+                event.listen(engine, 'connect',
+                             _sqlite_pragmas(app.config['SQLITE_PRAGMAS'], read_only=key == REPLICA_BIND))
+            elif engine.dialect.name == 'postgresql' and key == REPLICA_BIND:
+                event.listen(engine, 'connect', _postgres_read_only)
+
+
+def _postgres_read_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY')
+    cursor.close()
+    dbapi_connection.commit()
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to the replica bind while ``read_replica`` is active."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('read_replica') and not self._flushing
+                and isinstance(clause, Select)):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica(session):
+    """Route the session's reads to the replica (if any) inside the block."""
+    previous = session.info.get('read_replica', False)
+    session.info['read_replica'] = True
+    try:
+        yield
+    finally:
+        session.info['read_replica'] = previous
+
+
+def replica_reads(view):
+    """Serve a view's GET requests from the replica; other methods stay on the primary."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        from . import db
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+        with read_replica(db.session):
+            return view(*args, **kwargs)
+    return wrapped
+
+
+def replica_stream(chunks):
+    """Keep a streamed response body (e.g. an export) on the replica while it is generated."""
+    from . import db
+    with read_replica(db.session):
+        yield from chunks
@@ -0,0 +1,235 @@
+"""Synthetic data at production volume, for benchmarks and load tests.
+
+``generate`` bulk-inserts partners (with a weekly slot template), students and
+orders. The data is deterministic for a given seed, whether or not the order
+rows are built in a process pool. Order volume follows a weekday pattern that
+grows towards today. Partner popularity is Zipf-like and slot popularity
+peaks around lunch and late afternoon. No slot-date ever holds more active
+orders than its capacity.
+"""
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
+from . import db
+from .booking import rebuild_counters, rebuild_rollups
+from .models import Order, Partner, TimeSlot, User
+from .slot_templates import DAYS, expand_template, parse_ranges
+
+
+DEFAULT_RANGES = '9:00 AM - 11:00 AM, 12:00 PM - 2:00 PM, 3:00 PM - 7:00 PM'
+
+# Relative order volume per weekday, Monday first
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 0.95, 0.9, 0.6, 0.45)
+
+ORDER_COLUMNS = ('user_id', 'partner_id', 'time_slot_id', 'order_platform', 'order_id_text', 'college_reg_no',
+                 'name', 'phone', 'type', 'status', 'booking_date', 'created_at')
+
+# Orders generated (and inserted) per unit of work
+CHUNK_SIZE = 50_000
+
+
+def _slot_weight(start_minute):
+    """Demand for a slot by time of day: peaks at 1 PM and 5:30 PM."""
+    return 0.2 + math.exp(-((start_minute - 780) / 60) ** 2) + 1.3 * math.exp(-((start_minute - 1050) / 75) ** 2)
+
+
+def _date_weights(dates, today):
+    first = dates[0]
+    span = max((dates[-1] - first).days, 1)
+    # Volume grows towards the present; dates ahead are only partly booked yet
+    return [
+        WEEKDAY_WEIGHTS[d.weekday()] * (0.6 + 0.4 * (d - first).days / span)
+        * (1.0 if d <= today else max(0.15, 1 - 0.12 * (d - today).days))
+        for d in dates
+    ]
+
+
+def _apportion(total, weights):
+    """Split ``total`` into integers proportional to ``weights`` (largest remainder)."""
+    scale = total / sum(weights)
+    shares = [w * scale for w in weights]
+    counts = [int(s) for s in shares]
+    for i in sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _generate_chunk(job):
+    """Order rows (tuples in ORDER_COLUMNS order) for a run of dates; runs in worker processes."""
+    seed, index, dates, counts, today, slots_by_weekday, platforms, students, student_weights = job
+    rng = random.Random(f'{seed}:{index}')
+    rows = []
+    for day, wanted in zip(dates, counts):
+        slots = slots_by_weekday[day.weekday()]
+        free = {slot_id: capacity for slot_id, _, capacity, _ in slots}
+        picked = []
+        candidates = slots
+        # Draw by popularity; re-draw the overflow of full slots among the rest
+        while wanted and candidates:
+            draws = rng.choices(candidates, cum_weights=_cumulative(c[3] for c in candidates), k=wanted)
+            before = len(picked)
+            for slot in draws:
+                if free[slot[0]]:
+                    free[slot[0]] -= 1
+                    picked.append(slot)
+            wanted -= len(picked) - before
+            candidates = [c for c in candidates if free[c[0]]]
+        past = day < today
+        student_picks = rng.choices(students, cum_weights=student_weights, k=len(picked))
+        for (slot_id, partner_id, _, _), (user_id, n) in zip(picked, student_picks):
+            roll = rng.random()
+            if past:
+                status = 'Completed' if roll < 0.86 else 'Cancelled' if roll < 0.96 else 'Booked'
+            else:
+                status = 'Cancelled' if roll < 0.07 else 'Booked'
+            created = datetime.combine(day, datetime.min.time()) - timedelta(
+                days=rng.randrange(0, 8), seconds=rng.randrange(86_400))
+            rows.append((
+                user_id, partner_id, slot_id, platforms[partner_id], f'OD{rng.randrange(10 ** 12):012d}',
+                f'REG{n:06d}', f'Student {n}', f'9{n:09d}', 'Return' if rng.random() < 0.3 else 'Pickup',
+                status, day, created,
+            ))
+    return rows
+
+
+def _cumulative(weights):
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+PLATFORMS = ('Amazon', 'Flipkart', 'Myntra', 'Meesho', 'Ajio', 'Nykaa', 'Blinkit', 'Zepto', 'BigBasket', 'Tata CLiQ')
+
+
+def _insert_rows(table, columns, rows):
+    """executemany straight on the DBAPI cursor: bulk loads skip per-row Core overhead."""
+    conn = db.session.connection()
+    compiled = insert(table).compile(dialect=conn.dialect, column_keys=list(columns))
+    processors = [(i, table.c[c].type.bind_processor(conn.dialect)) for i, c in enumerate(columns)]
+    processors = [(i, p) for i, p in processors if p is not None]
+    if processors:
+        rows = [list(row) for row in rows]
+        for row in rows:
+            for i, process in processors:
+                row[i] = process(row[i])
+    if compiled.positional:
+        order = [columns.index(name) for name in compiled.positiontup]
+        params = [tuple(row[i] for i in order) for row in rows]
+    else:
+        params = [dict(zip(columns, row)) for row in rows]
+    conn.exec_driver_sql(compiled.string, params)
+
+
+def generate(partners, students, orders, seed=42, days_back=180, days_ahead=14, capacity=None,
+             workers=0, prefix='gen', password='Student@123', rebuild_indexes=True, progress=None):
+    """Insert a synthetic data set into the current database and commit it.
+
+    ``capacity`` fixes every slot's capacity; by default each partner's
+    capacity is sized from its expected peak demand. ``workers`` > 0 builds
+    order rows in that many processes. With ``rebuild_indexes`` the order
+    indexes are dropped for the load and rebuilt afterwards, which is much
+    faster for large loads. Returns a dict of row counts.
+    """
+    progress = progress or (lambda message: None)
+    rng = random.Random(seed)
+    today = date.today()
+    dates = [today + timedelta(days=d) for d in range(-days_back, days_ahead + 1)]
+    date_counts = _apportion(orders, _date_weights(dates, today))
+
+    conn = db.session.connection()
+    sqlite = conn.dialect.name == 'sqlite'
+    if sqlite:
+        # Durability is pointless for a scratch load (restored at the end); must precede any write
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+
+    password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+    db.session.execute(insert(User), [
+        {'username': f'{prefix}_partner{i}', 'email': f'{prefix}_partner{i}@example.com',
+         'password_hash': password_hash, 'role': 'partner'} for i in range(partners)
+    ] + [
+        {'username': f'{prefix}_student{i}', 'email': f'{prefix}_student{i}@example.com',
+         'password_hash': password_hash, 'role': 'user'} for i in range(students)
+    ])
+    owner_ids = list(db.session.scalars(
+        select(User.id).where(User.username.like(f'{prefix}\\_partner%', escape='\\')).order_by(User.id)))
+    db.session.execute(insert(Partner), [
+        {'platform_name': PLATFORMS[i % len(PLATFORMS)] + (f' {i // len(PLATFORMS) + 1}' if i >= len(PLATFORMS) else ''),
+         'contact_email': f'{prefix}_partner{i}@example.com', 'user_id': owner_id}
+        for i, owner_id in enumerate(owner_ids)
+    ])
+    partner_rows = db.session.execute(
+        select(Partner.id, Partner.platform_name).where(Partner.user_id.in_(owner_ids)).order_by(Partner.id)).all()
+    platforms = {pid: name for pid, name in partner_rows}
+    progress(f'{partners} partners, {students} students')
+
+    # Zipf-like partner popularity, shuffled so it is not tied to id order
+    popularity = [1 / (rank + 1) ** 1.1 for rank in range(partners)]
+    rng.shuffle(popularity)
+    partner_weight = {pid: w / sum(popularity) for (pid, _), w in zip(partner_rows, popularity)}
+
+    template = expand_template(DAYS, parse_ranges(DEFAULT_RANGES), 30, capacity or 1)
+    slot_share = max(_slot_weight(s['start_minute']) for s in template) / sum(
+        _slot_weight(s['start_minute']) for s in template if s['day_of_week'] == 'Monday')
+    peak_day = max(date_counts) if date_counts else 0
+    slot_rows = []
+    for pid in platforms:
+        cap = capacity or max(10, math.ceil(peak_day * partner_weight[pid] * slot_share * 1.25))
+        slot_rows.extend(dict(slot, partner_id=pid, max_capacity=cap) for slot in template)
+    db.session.execute(insert(TimeSlot), slot_rows)
+
+    slots_by_weekday = {i: [] for i in range(7)}
+    for slot_id, pid, day, start_minute, cap in db.session.execute(
+        select(TimeSlot.id, TimeSlot.partner_id, TimeSlot.day_of_week, TimeSlot.start_minute, TimeSlot.max_capacity)
+        .where(TimeSlot.partner_id.in_(list(platforms))).order_by(TimeSlot.id)
+    ):
+        slots_by_weekday[DAYS.index(day)].append((slot_id, pid, cap, partner_weight[pid] * _slot_weight(start_minute)))
+    progress(f'{len(slot_rows)} time slots')
+
+    student_ids = list(db.session.scalars(
+        select(User.id).where(User.username.like(f'{prefix}\\_student%', escape='\\')).order_by(User.id)))
+    student_list = list(zip(student_ids, range(len(student_ids))))
+    # A few heavy users, a long tail of occasional ones
+    student_weights = _cumulative(1 / (n + 10) ** 0.6 for n in range(len(student_list)))
+
+    jobs, batch_dates, batch_counts = [], [], []
+    for day, count in zip(dates, date_counts):
+        batch_dates.append(day)
+        batch_counts.append(count)
+        if sum(batch_counts) >= CHUNK_SIZE or day == dates[-1]:
+            jobs.append((seed, len(jobs), batch_dates, batch_counts, today, slots_by_weekday,
+                         platforms, student_list, student_weights))
+            batch_dates, batch_counts = [], []
+
+    indexes = list(Order.__table__.indexes) if rebuild_indexes else []
+    for index in indexes:
+        # Expression indexes are invisible to reflection, so checkfirst would miss them
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+
+    inserted = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        chunks = pool.map(_generate_chunk, jobs) if pool else map(_generate_chunk, jobs)
+        for rows in chunks:
+            if rows:
+                _insert_rows(Order.__table__, ORDER_COLUMNS, rows)
+            inserted += len(rows)
+            progress(f'{inserted} orders')
+    finally:
+        if pool:
+            pool.shutdown()
+    for index in indexes:
+        index.create(conn)
+    if indexes:
+        progress(f'rebuilt {len(indexes)} order indexes')
+    rebuild_counters(since=dates[0])
+    rebuild_rollups(since=dates[0])
+    db.session.commit()
+    if sqlite:
+        db.session.connection().exec_driver_sql('PRAGMA synchronous=FULL')
+    return {'partners': partners, 'students': students, 'time_slots': len(slot_rows), 'orders': inserted}
@@ -0,0 +1,244 @@
+"""Publish/subscribe for the live availability and order streams.
+
+Writers ``publish`` small JSON-able events on a channel after they commit;
+each open Server-Sent Events response holds a ``Subscription`` with a bounded
+queue. The local broker only reaches streams in the same worker process; with
+EVENTS_REDIS_URL set, events go through Redis pub/sub and every worker fans
+them out to its own subscribers. At most EVENTS_MAX_STREAMS streams stay open
+per process; ``open_stream`` refuses the rest so they can be told to come back.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from flask import current_app
+
+
+log = logging.getLogger(__name__)
+
+# Seconds between attempts to reconnect the Redis listener: doubled per failure up to the cap
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30
+
+
+class Subscription:
+    """One stream's view of a set of channels. Iterate with ``get``; always ``close``."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.queue = queue.Queue(maxsize)
+        # Set when events were dropped; the client should refetch instead of applying deltas
+        self.overflowed = False
+
+    def put(self, channel, event):
+        try:
+            self.queue.put_nowait((channel, event))
+        except queue.Full:
+            self.overflowed = True
+
+    def resync(self):
+        """Events may have been missed: mark the subscription overflowed and wake its stream."""
+        self.overflowed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        """The next ``(channel, event)``, or None after ``timeout`` seconds (or on ``resync``)."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Every event already waiting, without blocking."""
+        events = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return events
+            if item is not None:
+                events.append(item)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalBroker:
+    """Fan-out to the subscriptions of this process."""
+
+    def __init__(self, queue_size=256, max_streams=200):
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self._subscribers = {}  # channel -> set of Subscription
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.published = 0
+        self.dropped = 0
+        self.refused = 0
+
+    def open_stream(self):
+        """Count a new open stream; False (and nothing counted) when the process is full."""
+        with self._lock:
+            if self.streams >= self.max_streams:
+                self.refused += 1
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock:
+            self.streams -= 1
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            self.published += 1
+        for subscription in subscribers:
+            was_full = subscription.overflowed
+            subscription.put(channel, event)
+            if subscription.overflowed and not was_full:
+                self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'local',
+                'channels': len(self._subscribers),
+                'subscriptions': len({s for subs in self._subscribers.values() for s in subs}),
+                'streams': self.streams,
+                'max_streams': self.max_streams,
+                'refused': self.refused,
+                'published': self.published,
+                'dropped': self.dropped,
+            }
+
+
+class RedisBroker(LocalBroker):
+    """Events shared by every worker through Redis pub/sub.
+
+    ``publish`` sends to Redis; one listener thread per process receives every
+    channel under the prefix and delivers it to the local subscriptions. The
+    listener reconnects after errors and then makes every stream resync.
+    """
+
+    def __init__(self, url, queue_size=256, max_streams=200, prefix='events'):
+        super().__init__(queue_size, max_streams)
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError('EVENTS_REDIS_URL is set but the redis package is not installed') from exc
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._listener = None
+
+    def subscribe(self, channels):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+                    self._listener.start()
+        return super().subscribe(channels)
+
+    def _listen(self):
+        """Receive and deliver events for the life of the process, reconnecting with backoff."""
+        start = len(self.prefix) + 1
+        delay, lost = RECONNECT_DELAY, False
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(f'{self.prefix}:*')
+                if lost:
+                    log.warning('Event listener reconnected to Redis')
+                    self._resync()
+                delay, lost = RECONNECT_DELAY, False
+                for message in pubsub.listen():
+                    channel = message['channel'].decode()[start:]
+                    self.deliver(channel, json.loads(message['data']))
+            except Exception:
+                log.exception('Event listener lost Redis; retrying in %.1f s', delay)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            lost = True
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _resync(self):
+        """Events published while disconnected are gone: every open stream must look again."""
+        with self._lock:
+            subscriptions = {s for subs in self._subscribers.values() for s in subs}
+        for subscription in subscriptions:
+            subscription.resync()
+
+    def publish(self, channel, event):
+        self._redis.publish(f'{self.prefix}:{channel}', json.dumps(event, default=str))
+
+    def stats(self):
+        return dict(super().stats(), backend='redis')
+
+
+class EventBroker:
+    """Flask extension holding the process's pub/sub backend."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTS_REDIS_URL', None)
+        app.config.setdefault('EVENTS_QUEUE_SIZE', 256)
+        app.config.setdefault('EVENTS_KEEPALIVE', 15)  # seconds between comment lines on idle streams
+        app.config.setdefault('EVENTS_STREAM_SECONDS', 300)
+        app.config.setdefault('EVENTS_MAX_STREAMS', 200)  # open streams per process
+        redis_url = app.config['EVENTS_REDIS_URL'] or app.config.get('AVAILABILITY_CACHE_REDIS_URL')
+        sizes = app.config['EVENTS_QUEUE_SIZE'], app.config['EVENTS_MAX_STREAMS']
+        backend = RedisBroker(redis_url, *sizes) if redis_url else LocalBroker(*sizes)
+        app.extensions['event_broker'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['event_broker']
+
+    def publish(self, channel, **event):
+        self.backend.publish(channel, event)
+
+    def subscribe(self, *channels):
+        return self.backend.subscribe(channels)
+
+    def open_stream(self):
+        return self.backend.open_stream()
+
+    def stats(self):
+        return self.backend.stats()
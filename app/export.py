@@ -0,0 +1,126 @@
+"""Streaming order exports (CSV / NDJSON, optionally gzipped).
+
+Rows are pulled from a server-side cursor in ``yield_per`` partitions and
+written out chunk by chunk, so memory stays flat however many orders match.
+Archived orders are streamed first, then live ones, each in id order.
+"""
+import csv
+import io
+import json
+import re
+import unicodedata
+import zlib
+from datetime import datetime
+from urllib.parse import quote
+from sqlalchemy import select
+from . import db
+from .models import Order, OrderArchive, TimeSlot
+
+
+YIELD_PER = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Strings name order columns, found in both order and order_archive
+EXPORT_COLUMNS = [
+    ('order_id', 'id'),
+    ('created_at', 'created_at'),
+    ('booking_date', 'booking_date'),
+    ('day_of_week', TimeSlot.day_of_week),
+    ('start_time', TimeSlot.start_time),
+    ('end_time', TimeSlot.end_time),
+    ('platform', 'order_platform'),
+    ('order_ref', 'order_id_text'),
+    ('name', 'name'),
+    ('college_reg_no', 'college_reg_no'),
+    ('phone', 'phone'),
+    ('type', 'type'),
+    ('status', 'status'),
+]
+
+
+def parse_export_filters(args):
+    """Export filters from a request's query string; raises ValueError on bad input."""
+    filters = {}
+    for key in ('from', 'to'):
+        if args.get(key):
+            filters[key] = datetime.strptime(args[key], '%Y-%m-%d').date()
+    if args.get('slot_id'):
+        filters['slot_id'] = int(args['slot_id'])
+    if args.get('status'):
+        filters['status'] = args['status']
+    if args.get('partner_id'):
+        filters['partner_id'] = int(args['partner_id'])
+    return filters
+
+
+def _tier_query(model, filters):
+    table = model.__table__
+    columns = [table.c[column] if isinstance(column, str) else column for _, column in EXPORT_COLUMNS]
+    query = select(*columns).join(TimeSlot, table.c.time_slot_id == TimeSlot.id)
+    if 'partner_id' in filters:
+        query = query.where(table.c.partner_id == filters['partner_id'])
+    if 'from' in filters:
+        query = query.where(table.c.booking_date >= filters['from'])
+    if 'to' in filters:
+        query = query.where(table.c.booking_date <= filters['to'])
+    if 'slot_id' in filters:
+        query = query.where(table.c.time_slot_id == filters['slot_id'])
+    if 'status' in filters:
+        query = query.where(table.c.status == filters['status'])
+    # Primary-key order streams straight off the table with no sort step
+    return query.order_by(table.c.id)
+
+
+def export_query(filters):
+    """SELECTs of the export columns for the matching archived and live orders, in that order."""
+    return [_tier_query(model, filters) for model in (OrderArchive, Order)]
+
+
+def _partitions(queries):
+    for query in queries:
+        result = db.session.execute(query.execution_options(stream_results=True, yield_per=YIELD_PER))
+        yield from result.partitions()
+
+
+def _csv_chunks(queries):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    yield buffer.getvalue()
+    for rows in _partitions(queries):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(queries):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for rows in _partitions(queries):
+        yield ''.join(json.dumps(dict(zip(names, row)), default=str) + '\n' for row in rows)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(queries, fmt='csv', gzip=False):
+    """Generator of response body chunks for ``export_query`` results in ``fmt``."""
+    chunks = _ndjson_chunks(queries) if fmt == 'ndjson' else _csv_chunks(queries)
+    return _gzipped(chunks) if gzip else (chunk.encode('utf-8') for chunk in chunks)
+
+
+def attachment_header(filename):
+    """Content-Disposition for a download: an ASCII ``filename`` plus the exact name as RFC 5987 ``filename*``."""
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode()
+    ascii_name = re.sub(r'[^A-Za-z0-9._]+', '-', ascii_name).strip('-') or 'export'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
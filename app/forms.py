@@ -2,6 +2,7 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Regexp
 from app.models import User
+from app.identity import credentials_taken
 import re
 
 class RegistrationForm(FlaskForm):
@@ -12,15 +13,15 @@ class RegistrationForm(FlaskForm):
     role = SelectField('Role', choices=[('user', 'Student'), ('partner', 'Partner')], validators=[DataRequired()])
     submit = SubmitField('Sign Up')
 
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('That username is taken. Please choose a different one.')
-
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data.lower()).first()
-        if user:
-            raise ValidationError('That email is taken. Please choose a different one.')
+    def validate(self, extra_validators=None):
+        valid = super().validate(extra_validators)
+        # Username and email uniqueness share one query
+        username_taken, email_taken = credentials_taken(self.username.data, self.email.data)
+        if username_taken:
+            self.username.errors.append('That username is taken. Please choose a different one.')
+        if email_taken:
+            self.email.errors.append('That email is taken. Please choose a different one.')
+        return valid and not username_taken and not email_taken
     
     def validate_password(self, password):
         pwd = password.data
@@ -0,0 +1,129 @@
+"""Seat holds while a student fills in the booking form.
+
+Picking a slot claims a seat on ``slot_booking_counter`` exactly as a booking
+does and records a ``SlotHold`` that lasts HOLD_SECONDS. Submitting the form
+deletes the hold in the order's own transaction, so the seat passes to the
+order. Expired holds give their seats back: at once for the slot-date being
+booked or held, and for the rest through ``sweep_expired_holds`` (run by
+``scripts/sweep_holds.py`` and, a batch at a time, whenever a hold is placed).
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, select
+from . import db
+from .availability import availability_changed
+from .booking import release_seats, reserve_slot
+from .models import SlotBookingCounter, SlotHold, TimeSlot
+
+
+hold = SlotHold.__table__
+
+# Expired holds cleared on the way whenever a hold is placed
+SWEEP_ON_PLACE = 50
+
+
+def _delete(*conditions):
+    """Delete matching holds; returns ``(time_slot_id, booking_date)`` for each row this call removed."""
+    stmt = delete(hold).where(*conditions)
+    if db.session.get_bind().dialect.delete_returning:
+        return [tuple(row) for row in db.session.execute(stmt.returning(hold.c.time_slot_id, hold.c.booking_date))]
+    rows = db.session.execute(select(hold.c.id, hold.c.time_slot_id, hold.c.booking_date).where(*conditions)).all()
+    if rows:
+        db.session.execute(delete(hold).where(hold.c.id.in_([row.id for row in rows])))
+    return [(row.time_slot_id, row.booking_date) for row in rows]
+
+
+def _drop(*conditions):
+    """Delete matching holds and hand their seats back; returns the (slot, date) of each."""
+    removed = _delete(*conditions)
+    release_seats(Counter(removed))
+    return removed
+
+
+def _expired(now, limit):
+    due = select(hold.c.id).where(hold.c.expires_at <= now).order_by(hold.c.expires_at).limit(limit)
+    return _drop(hold.c.id.in_(list(db.session.scalars(due))))
+
+
+def announce_freed(freed):
+    """availability_changed for every (slot, date) whose seats came back; after the commit."""
+    if not freed:
+        return
+    partners = dict(db.session.execute(
+        select(TimeSlot.id, TimeSlot.partner_id).where(TimeSlot.id.in_({slot_id for slot_id, _ in freed}))).all())
+    for partner_id, day in {(partners[slot_id], day) for slot_id, day in freed if slot_id in partners}:
+        availability_changed(partner_id, day)
+
+
+def place_hold(user_id, slot, booking_date, now=None):
+    """Hold a seat in ``slot`` on ``booking_date`` for the user; commits.
+
+    A student holds one seat at a time, so any earlier hold of theirs is
+    released. Returns the new ``SlotHold``, or None when the slot is full.
+    """
+    now = now or datetime.utcnow()
+    freed = _drop(hold.c.user_id == user_id)
+    # Expired holds on this slot-date first: the page already counts their seats as free
+    freed += _drop(hold.c.time_slot_id == slot.id, hold.c.booking_date == booking_date, hold.c.expires_at <= now)
+    freed += _expired(now, SWEEP_ON_PLACE)
+    placed = None
+    if reserve_slot(slot.id, booking_date):
+        placed = SlotHold(token=uuid.uuid4().hex, user_id=user_id, time_slot_id=slot.id, booking_date=booking_date,
+                          expires_at=now + timedelta(seconds=current_app.config['HOLD_SECONDS']))
+        db.session.add(placed)
+    db.session.commit()
+    announce_freed(freed + ([(slot.id, booking_date)] if placed else []))
+    return placed
+
+
+def release_hold(user_id, token):
+    """Give up the user's hold (they picked another date or left); commits. Returns True if it existed."""
+    freed = _drop(hold.c.token == token, hold.c.user_id == user_id)
+    db.session.commit()
+    announce_freed(freed)
+    return bool(freed)
+
+
+def claim_seat(user_id, slot_id, booking_date, token=None):
+    """Seat for an order being inserted, inside the caller's transaction; True if there is one.
+
+    The user's hold on that slot-date becomes the order's seat (even if it has
+    just expired, as long as nobody swept it). Otherwise expired holds on the
+    slot-date are cleared and a seat is claimed afresh. The caller commits.
+    """
+    if token and _delete(hold.c.token == token, hold.c.user_id == user_id,
+                         hold.c.time_slot_id == slot_id, hold.c.booking_date == booking_date):
+        return True
+    _drop(hold.c.time_slot_id == slot_id, hold.c.booking_date == booking_date,
+          hold.c.expires_at <= datetime.utcnow())
+    return reserve_slot(slot_id, booking_date)
+
+
+def sweep_expired_holds(now=None, batch_size=1000):
+    """Release every expired hold, a committed batch at a time; returns the number released."""
+    now = now or datetime.utcnow()
+    released = 0
+    while True:
+        freed = _expired(now, batch_size)
+        db.session.commit()
+        announce_freed(freed)
+        released += len(freed)
+        if len(freed) < batch_size:
+            return released
+
+
+
+def drop_holds_of(user):
+    """Before deleting ``user``, inside the caller's transaction: their holds go and hand back
+    their seats; for a partner, every hold and seat counter on their slots goes too.
+    Returns the slot-dates freed, for ``announce_freed`` after the commit.
+    """
+    freed = _drop(hold.c.user_id == user.id)
+    # Same condition as the admin delete, which only removes a partner user's profile and slots
+    if user.role == 'partner' and user.partner_profile is not None:
+        slot_ids = select(TimeSlot.id).where(TimeSlot.partner_id == user.partner_profile.id).scalar_subquery()
+        db.session.execute(delete(hold).where(hold.c.time_slot_id.in_(slot_ids)))
+        db.session.execute(delete(SlotBookingCounter).where(SlotBookingCounter.time_slot_id.in_(slot_ids)))
+    return freed
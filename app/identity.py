@@ -0,0 +1,58 @@
+"""User lookups on the authentication path.
+
+``load_identity`` backs Flask-Login's user_loader from the identity cache, so
+authenticated requests (every /api/get_slots poll included) do not query the
+user table; ``forget_user`` must be called after a user's role, password or
+existence changes.
+"""
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import make_transient_to_detached
+from . import db, identity_cache
+from .models import User
+
+
+# What load_user needs; the password hash is deliberately never cached
+IDENTITY_COLUMNS = ('id', 'username', 'email', 'role')
+
+
+def load_identity(user_id):
+    """The user for a session id, rebuilt from the cache when possible."""
+    data = identity_cache.get(user_id)
+    if data is None:
+        generation = identity_cache.generation()
+        user = db.session.get(User, user_id)
+        if user is not None:
+            identity_cache.set(user_id, {c: getattr(user, c) for c in IDENTITY_COLUMNS}, generation)
+        return user
+    user = User(**data)
+    # Attach as if loaded from the database, without a query; other columns load on access
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def forget_user(user_id):
+    identity_cache.invalidate(user_id)
+
+
+def find_login_user(ident):
+    """The user whose email or username (case-insensitive) is ``ident``, in one query.
+
+    An email match wins over a username match.
+    """
+    ident = ident.strip().lower()
+    return (User.query
+            .filter(or_(User.email == ident, func.lower(User.username) == ident))
+            .order_by(case((User.email == ident, 0), else_=1), User.id)
+            .first())
+
+
+def credentials_taken(username, email):
+    """``(username_taken, email_taken)`` from a single query."""
+    username = (username or '').strip().lower()
+    email = (email or '').strip().lower()
+    rows = db.session.execute(
+        select(func.lower(User.username), User.email)
+        .where(or_(func.lower(User.username) == username, User.email == email))
+        .limit(2)
+    ).all()
+    return any(row[0] == username for row in rows), any(row[1] == email for row in rows)
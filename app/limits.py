@@ -0,0 +1,259 @@
+"""Admission control for booking spikes: token buckets and a bounded booking queue.
+
+Each rule in RATE_LIMITS has a bucket per signed-in user (or client address)
+and one shared by everybody; a request takes a token from both or is turned
+away with 429 and a Retry-After. Buckets live in the worker process unless
+RATE_LIMIT_REDIS_URL points at Redis. Bookings that get through then pass the
+booking queue: at most BOOKING_WORKERS run at once per process, up to
+BOOKING_QUEUE_SIZE more wait up to BOOKING_QUEUE_TIMEOUT seconds, and the rest
+get a fast 503 instead of piling up on the database's write lock
+(BOOKING_WORKERS = 0 turns the queue off).
+"""
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, render_template, request
+from flask_login import current_user
+
+
+# rule -> {scope: (tokens per second, burst)}; scope 'user' is per user, 'global' is shared
+RATE_LIMITS = {
+    'booking': {'user': (0.5, 5), 'global': (50, 100)},
+    'api': {'user': (5, 30), 'global': (200, 400)},
+}
+
+# Buckets kept per process before idle (full) ones are dropped
+MAX_LOCAL_BUCKETS = 10000
+
+
+class Busy(Exception):
+    """Request turned away by admission control; retry after ``retry_after`` seconds."""
+
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.message = message
+
+
+class LocalBuckets:
+    """Token buckets private to one worker process."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated, rate, burst)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token; returns 0 when granted, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, rate, burst)
+            if len(self._buckets) > MAX_LOCAL_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        for key, (tokens, updated, rate, burst) in list(self._buckets.items()):
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'local', 'buckets': len(self._buckets)}
+
+
+# KEYS[1] bucket; ARGV rate, burst, now. Returns the wait in seconds (0 when granted) as a string
+_TAKE_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or burst
+local at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker; each take is one atomic script call."""
+
+    def __init__(self, url, prefix='ratelimit'):
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError('RATE_LIMIT_REDIS_URL is set but the redis package is not installed') from exc
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+
+    def take(self, key, rate, burst):
+        return float(self._take(keys=[f'{self.prefix}:{key}'], args=[rate, burst, time.time()]))
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+class BookingQueue:
+    """At most ``workers`` bookings at once; ``size`` more may wait ``timeout`` seconds for a turn."""
+
+    def __init__(self, workers, size, timeout):
+        self.workers = workers
+        self.size = size
+        self.timeout = timeout
+        self._turns = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._service = 0.05  # moving average of seconds per booking, for Retry-After
+
+    def retry_after(self):
+        return self._service * (self.waiting + 1) / self.workers
+
+    def enter(self):
+        """Wait for a turn; raises ``Busy`` when the queue is full or the wait times out."""
+        if not self._turns.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.size:
+                    self.rejected += 1
+                    raise Busy(503, self.retry_after(), 'Bookings are very busy right now')
+                self.waiting += 1
+                self.queued += 1
+            try:
+                acquired = self._turns.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.timed_out += 1
+                raise Busy(503, self.retry_after(), 'Bookings are very busy right now')
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+        return time.perf_counter()
+
+    def leave(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.running -= 1
+            self._service = 0.8 * self._service + 0.2 * elapsed
+        self._turns.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'size': self.size,
+                'running': self.running,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+
+def _busy_response(error):
+    if request.path.startswith('/api/') or request.is_json:
+        response = jsonify({'error': f'{error.message}; retry after {error.retry_after} s',
+                            'retry_after': error.retry_after})
+    else:
+        response = current_app.make_response(render_template('busy.html', title='Busy', error=error))
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class AdmissionControl:
+    """Flask extension: ``limit(rule)`` and ``queue()`` view decorators."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', dict(RATE_LIMITS))
+        app.config.setdefault('RATE_LIMIT_REDIS_URL', None)
+        app.config.setdefault('BOOKING_WORKERS', 4)
+        app.config.setdefault('BOOKING_QUEUE_SIZE', 16)
+        app.config.setdefault('BOOKING_QUEUE_TIMEOUT', 2.0)
+        redis_url = app.config['RATE_LIMIT_REDIS_URL']
+        workers = app.config['BOOKING_WORKERS']
+        app.extensions['admission'] = {
+            'buckets': RedisBuckets(redis_url) if redis_url else LocalBuckets(),
+            'queue': BookingQueue(workers, app.config['BOOKING_QUEUE_SIZE'],
+                                  app.config['BOOKING_QUEUE_TIMEOUT']) if workers else None,
+            'lock': threading.Lock(),
+            'limited': {},  # (rule, scope) -> requests turned away
+        }
+        app.register_error_handler(Busy, _busy_response)
+
+    @property
+    def state(self):
+        return current_app.extensions['admission']
+
+    def check(self, rule):
+        """Take a token from the rule's user and global buckets; raises ``Busy`` when either is empty."""
+        if not current_app.config['RATE_LIMIT_ENABLED']:
+            return
+        limits = current_app.config['RATE_LIMITS'].get(rule, {})
+        who = f'user:{current_user.id}' if current_user.is_authenticated else f'addr:{request.remote_addr}'
+        for scope, key in (('user', f'{rule}:{who}'), ('global', f'{rule}:global')):
+            if scope not in limits:
+                continue
+            wait = self.state['buckets'].take(key, *limits[scope])
+            if wait:
+                with self.state['lock']:
+                    limited = self.state['limited']
+                    limited[(rule, scope)] = limited.get((rule, scope), 0) + 1
+                raise Busy(429, wait, 'Too many requests')
+
+    def limit(self, rule, methods=None):
+        """Rate-limit a view under ``rule`` (only for ``methods`` when given)."""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if methods is None or request.method in methods:
+                    self.check(rule)
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    def queue(self, methods=None):
+        """Run a view through the booking queue (only for ``methods`` when given)."""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                booking_queue = self.state['queue']
+                if booking_queue is None or (methods is not None and request.method not in methods):
+                    return view(*args, **kwargs)
+                started = booking_queue.enter()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    booking_queue.leave(started)
+            return wrapped
+        return decorator
+
+    def stats(self):
+        state = self.state
+        with state['lock']:
+            limited = {f'{rule}:{scope}': n for (rule, scope), n in sorted(state['limited'].items())}
+        return {'enabled': current_app.config['RATE_LIMIT_ENABLED'], 'buckets': state['buckets'].stats(),
+                'limited': limited, 'queue': state['queue'].stats() if state['queue'] else None}
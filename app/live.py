@@ -0,0 +1,108 @@
+"""Server-Sent Event streams: live slot capacity and a partner's new-order feed.
+
+``availability_stream`` sends a snapshot of remaining seats for one
+partner-date, then only the slots whose numbers changed. ``orders_stream``
+forwards booking and status events for one partner. Both end after
+EVENTS_STREAM_SECONDS; the browser's EventSource reconnects by itself.
+"""
+import json
+import time
+from flask import current_app
+from . import db, events
+from .availability import availability_channel, slot_availability
+
+
+# Browsers wait this long (ms) before reconnecting a closed stream
+RETRY_MS = 3000
+
+# Reconnect delay (ms) handed to clients turned away because the process has no room for another stream
+BUSY_RETRY_MS = 30000
+
+
+def orders_channel(partner_id):
+    return f'orders:{partner_id}'
+
+
+def _sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, default=str)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def _remaining(partner_id, booking_date):
+    remaining = {str(slot['id']): slot['available_capacity'] for slot in slot_availability(partner_id, booking_date)}
+    # Long-lived streams must not keep a pooled connection checked out between events
+    db.session.close()
+    return remaining
+
+
+def _events(subscription):
+    """``(channel, event)`` items from ``subscription``, None on every idle keepalive, until the stream's time is up."""
+    keepalive = current_app.config['EVENTS_KEEPALIVE']
+    deadline = time.monotonic() + current_app.config['EVENTS_STREAM_SECONDS']
+    while (left := deadline - time.monotonic()) > 0:
+        yield subscription.get(timeout=min(keepalive, left))
+
+
+def availability_stream(partner_id, booking_date):
+    """SSE body for one partner-date: a ``snapshot`` event, then ``capacity`` deltas."""
+    day = booking_date.isoformat()
+    with events.subscribe(availability_channel(partner_id), availability_channel(partner_id, booking_date)) as subscription:
+        # Subscribed before the snapshot, so nothing committed in between is missed
+        remaining = _remaining(partner_id, booking_date)
+        seq = 0
+        yield f'retry: {RETRY_MS}\n' + _sse('snapshot', {'date': day, 'remaining': remaining}, seq)
+        for item in _events(subscription):
+            if item is None and not subscription.overflowed:
+                yield ': keepalive\n\n'
+                continue
+            # Fold a burst of bookings into one update; the newest numbers win
+            items = ([item] if item else []) + subscription.drain()
+            if subscription.overflowed or not all('remaining' in event for _, event in items):
+                # Events were dropped, or slots were added or removed: look again
+                subscription.overflowed = False
+                current = _remaining(partner_id, booking_date)
+            else:
+                current = items[-1][1]['remaining']
+            changed = {slot: n for slot, n in current.items() if remaining.get(slot) != n}
+            changed.update({slot: None for slot in remaining if slot not in current})
+            remaining = current
+            if changed:
+                seq += 1
+                yield _sse('capacity', {'date': day, 'changed': changed}, seq)
+
+
+def orders_stream(partner_id):
+    """SSE body for a partner's dashboard: ``order`` and ``status`` events as they commit."""
+    with events.subscribe(orders_channel(partner_id)) as subscription:
+        yield f'retry: {RETRY_MS}\n\n'
+        for item in _events(subscription):
+            if item is None and not subscription.overflowed:
+                yield ': keepalive\n\n'
+                continue
+            for _, event in ([item] if item else []) + subscription.drain():
+                yield _sse(event['type'], event)
+            if subscription.overflowed:
+                # Events were dropped: the page has to reload to be right again
+                subscription.overflowed = False
+                yield _sse('resync', {})
+
+
+def order_booked(order, slot):
+    """Announce a committed booking to the partner's open dashboards."""
+    events.publish(
+        orders_channel(order.partner_id), type='order', id=order.id,
+        created_at=order.created_at.strftime('%Y-%m-%d %H:%M'), name=order.name,
+        college_reg_no=order.college_reg_no, phone=order.phone, order_type=order.type, status=order.status,
+        booking_date=order.booking_date.isoformat(),
+        slot=f'{slot.day_of_week} {slot.start_time} - {slot.end_time}',
+    )
+
+
+def orders_updated(status, touched):
+    """Announce a committed ``bulk_set_status`` (its ``touched`` result) to the partners affected."""
+    by_partner = {}
+    for (partner_id, _), order_ids in touched.items():
+        by_partner.setdefault(partner_id, []).extend(order_ids)
+    for partner_id, order_ids in by_partner.items():
+        events.publish(orders_channel(partner_id), type='status', status=status, order_ids=order_ids)
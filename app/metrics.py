@@ -0,0 +1,222 @@
+"""Per-request instrumentation: SQL count and time, template time, total latency.
+
+Numbers are collected per request in ``g`` from SQLAlchemy engine events and
+Flask's template signals, then folded into per-endpoint histograms that
+``/admin/metrics`` renders in the Prometheus text format. Histograms live in
+the worker process, so each gunicorn worker reports its own.
+"""
+import threading
+import time
+from collections import deque
+from flask import current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_engine_hooked = False
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def lines(self, name, labels):
+        out, cumulative = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f'{name}_sum{{{labels}}} {self.total:.6f}')
+        out.append(f'{name}_count{{{labels}}} {self.count}')
+        return out
+
+
+# name -> (help text, bucket bounds, per-request field)
+HISTOGRAMS = {
+    'campus_request_duration_seconds': ('Total request latency.', LATENCY_BUCKETS, 'total'),
+    'campus_request_sql_seconds': ('Time spent executing SQL per request.', LATENCY_BUCKETS, 'sql_time'),
+    'campus_request_template_seconds': ('Time spent rendering templates per request.', LATENCY_BUCKETS, 'render_time'),
+    'campus_request_queries': ('SQL statements executed per request.', QUERY_BUCKETS, 'queries'),
+}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so nothing outlives a statement that fails
+    if context is not None and has_request_context() and 'request_metrics' in g:
+        context._metrics_started = time.perf_counter()
+
+
+def _record(context, statement):
+    started = getattr(context, '_metrics_started', None)
+    if started is None or not has_request_context() or 'request_metrics' not in g:
+        return
+    context._metrics_started = None
+    elapsed = time.perf_counter() - started
+    current = g.request_metrics
+    current['queries'] += 1
+    current['sql_time'] += elapsed
+    if elapsed * 1000 >= current_app.config['METRICS_SLOW_QUERY_MS']:
+        current['slow'].append((elapsed, statement))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(context, statement)
+
+
+def _handle_error(exception_context):
+    # Failed statements (constraint errors, lock timeouts) are timed too
+    _record(exception_context.execution_context, exception_context.statement)
+
+
+class RequestMetrics:
+    """Flask extension collecting request metrics for one app."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _engine_hooked
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SLOW_QUERY_MS', 100)
+        app.config.setdefault('METRICS_DEBUG_HEADERS', False)
+        app.extensions['request_metrics'] = {
+            'lock': threading.Lock(),
+            'histograms': {},  # (name, endpoint) -> _Histogram
+            'requests': {},  # (endpoint, status class) -> count
+            'slow_total': {},  # endpoint -> count
+            'slow_recent': deque(maxlen=50),
+        }
+        if not app.config['METRICS_ENABLED']:
+            return
+        # Every engine (primary and any replica bind) reports into the current request
+        if not _engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            _engine_hooked = True
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def _start():
+        g.request_metrics = {'started': time.perf_counter(), 'queries': 0, 'sql_time': 0.0,
+                             'render_time': 0.0, 'render_started': None, 'slow': []}
+
+    @staticmethod
+    def _render_started(app, template, context, **extra):
+        if 'request_metrics' in g:
+            g.request_metrics['render_started'] = time.perf_counter()
+
+    @staticmethod
+    def _render_finished(app, template, context, **extra):
+        current = g.get('request_metrics')
+        if current and current['render_started'] is not None:
+            current['render_time'] += time.perf_counter() - current['render_started']
+            current['render_started'] = None
+
+    def _finish(self, response):
+        current = g.pop('request_metrics', None)
+        if current is None:
+            return response
+        current['total'] = time.perf_counter() - current['started']
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        self.record(endpoint, response.status_code, current)
+        for elapsed, statement in current['slow']:
+            current_app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint,
+                                       ' '.join(statement.split())[:500])
+        if current_app.config['METRICS_DEBUG_HEADERS']:
+            # Streamed responses are timed up to the first byte only
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={current["sql_time"] * 1000:.1f};desc="{current["queries"]} queries"',
+                f'tpl;dur={current["render_time"] * 1000:.1f}',
+                f'total;dur={current["total"] * 1000:.1f}',
+            ])
+            response.headers['X-Query-Count'] = str(current['queries'])
+        return response
+
+    @property
+    def state(self):
+        return current_app.extensions['request_metrics']
+
+    def record(self, endpoint, status, current):
+        state = self.state
+        with state['lock']:
+            for name, (_, buckets, field) in HISTOGRAMS.items():
+                histogram = state['histograms'].get((name, endpoint))
+                if histogram is None:
+                    histogram = state['histograms'][(name, endpoint)] = _Histogram(buckets)
+                histogram.observe(current[field])
+            key = (endpoint, f'{status // 100}xx')
+            state['requests'][key] = state['requests'].get(key, 0) + 1
+            if current['slow']:
+                state['slow_total'][endpoint] = state['slow_total'].get(endpoint, 0) + len(current['slow'])
+                for elapsed, statement in current['slow']:
+                    state['slow_recent'].append({
+                        'endpoint': endpoint,
+                        'ms': round(elapsed * 1000, 1),
+                        'statement': ' '.join(statement.split())[:2000],
+                        'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    })
+
+    def slow_queries(self):
+        with self.state['lock']:
+            return list(self.state['slow_recent'])
+
+    def render_prometheus(self, caches=None, admission=None):
+        """Every metric in the Prometheus text exposition format."""
+        state = self.state
+        lines = []
+        with state['lock']:
+            for name, (help_text, _, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (hist_name, endpoint), histogram in sorted(state['histograms'].items()):
+                    if hist_name == name:
+                        lines += histogram.lines(name, f'endpoint="{endpoint}"')
+            lines += ['# HELP campus_requests_total Requests served.', '# TYPE campus_requests_total counter']
+            lines += [f'campus_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}'
+                      for (endpoint, status), n in sorted(state['requests'].items())]
+            lines += ['# HELP campus_slow_queries_total Queries slower than METRICS_SLOW_QUERY_MS.',
+                      '# TYPE campus_slow_queries_total counter']
+            lines += [f'campus_slow_queries_total{{endpoint="{endpoint}"}} {n}'
+                      for endpoint, n in sorted(state['slow_total'].items())]
+        caches = caches or {}
+        for field, kind, name in (('hits', 'counter', 'campus_cache_hits_total'),
+                                  ('misses', 'counter', 'campus_cache_misses_total'),
+                                  ('evictions', 'counter', 'campus_cache_evictions_total'),
+                                  ('size', 'gauge', 'campus_cache_entries')):
+            values = [(cache, stats[field]) for cache, stats in sorted(caches.items()) if field in stats]
+            if values:
+                lines.append(f'# TYPE {name} {kind}')
+                lines += [f'{name}{{cache="{cache}"}} {value}' for cache, value in values]
+        if admission:
+            lines += ['# HELP campus_rate_limited_total Requests turned away by a rate limit.',
+                      '# TYPE campus_rate_limited_total counter']
+            for key, n in admission['limited'].items():
+                rule, scope = key.split(':')
+                lines.append(f'campus_rate_limited_total{{rule="{rule}",scope="{scope}"}} {n}')
+            booking_queue = admission['queue']
+            if booking_queue:
+                for field, kind, name in (('queued', 'counter', 'campus_booking_queued_total'),
+                                          ('rejected', 'counter', 'campus_booking_queue_rejected_total'),
+                                          ('timed_out', 'counter', 'campus_booking_queue_timeouts_total'),
+                                          ('running', 'gauge', 'campus_booking_running'),
+                                          ('waiting', 'gauge', 'campus_booking_waiting')):
+                    lines += [f'# TYPE {name} {kind}', f'{name} {booking_queue[field]}']
+        return '\n'.join(lines) + '\n'
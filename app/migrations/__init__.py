@@ -0,0 +1,212 @@
+"""Versioned schema migrations.
+
+Each migration in ``versions.py`` runs once; applied versions are recorded in
+``schema_migrations``. Migrations are written to be re-runnable, so an
+interrupted one simply runs again. Backfills walk the table in keyset batches,
+commit once per batch and record the last key reached, so a restart picks up
+where the previous run stopped. Run them with ``python migrate.py``.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+import sqlalchemy as sa
+from flask import current_app
+from .. import db
+
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.String(32), primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+# Resume points of chunked backfills: one row per (migration, step)
+migration_progress = db.Table(
+    'schema_migration_progress',
+    db.Column('version', db.String(32), primary_key=True),
+    db.Column('step', db.String(100), primary_key=True),
+    db.Column('last_key', db.BigInteger, nullable=True),
+    db.Column('rows_done', db.BigInteger, nullable=False, default=0),
+    db.Column('finished', db.Boolean, nullable=False, default=False),
+    db.Column('updated_at', db.DateTime, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    run: Callable
+
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register ``fn(ctx)`` as migration ``version``; versions apply in sorted order."""
+    def register(fn):
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return register
+
+
+class MigrationContext:
+    """Idempotent schema helpers handed to each migration."""
+
+    def __init__(self, version, batch_size, progress):
+        self.version = version
+        self.batch_size = batch_size
+        self.progress = progress
+
+    @property
+    def dialect(self):
+        return db.engine.dialect.name
+
+    def quote(self, name):
+        return db.engine.dialect.identifier_preparer.quote(name)
+
+    def execute(self, sql, params=None):
+        result = db.session.execute(sa.text(sql), params or {})
+        db.session.commit()
+        return result
+
+    def has_table(self, table):
+        return sa.inspect(db.engine).has_table(table)
+
+    def has_column(self, table, column):
+        return any(c['name'] == column for c in sa.inspect(db.engine).get_columns(table))
+
+    def create_all(self):
+        """Create every model table that does not exist yet (existing tables are untouched)."""
+        db.create_all()
+        self.progress('  tables up to date')
+
+    def create_table(self, table):
+        table.create(db.engine, checkfirst=True)
+
+    def add_column(self, table, definition):
+        """``ALTER TABLE ... ADD COLUMN`` unless the column exists; ``definition`` like 'booking_date DATE'."""
+        column = definition.split()[0]
+        if self.has_column(table, column):
+            return
+        self.execute(f'ALTER TABLE {self.quote(table)} ADD COLUMN {definition}')
+        self.progress(f'  added {table}.{column}')
+
+    def _ddl(self, sql):
+        if self.dialect == 'postgresql':
+            # CONCURRENTLY cannot run in a transaction block
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(sa.text(sql))
+        else:
+            self.execute(sql)
+
+    def create_index(self, name, table, expression):
+        """Create an index if missing; built without blocking writes on PostgreSQL."""
+        concurrently = 'CONCURRENTLY ' if self.dialect == 'postgresql' else ''
+        self._ddl(f'CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {self.quote(table)} ({expression})')
+
+    def drop_index(self, name):
+        concurrently = 'CONCURRENTLY ' if self.dialect == 'postgresql' else ''
+        self._ddl(f'DROP INDEX {concurrently}IF EXISTS {name}')
+
+    def backfill(self, step, table, columns, where, compute, key='id'):
+        """Update ``table`` in keyset batches of ``batch_size`` rows, one commit per batch.
+
+        ``table`` is a lightweight ``sa.table()``. Rows matching ``where`` are
+        read (``key`` plus ``columns``) in key order, and ``compute(row)``
+        returns the new values for a row (or None to leave it). The last key
+        is saved with every batch, so an interrupted backfill resumes there.
+        Returns the number of rows updated.
+        """
+        state = db.session.execute(
+            sa.select(migration_progress.c.last_key, migration_progress.c.rows_done, migration_progress.c.finished)
+            .where(migration_progress.c.version == self.version, migration_progress.c.step == step)
+        ).first()
+        if state and state.finished:
+            return state.rows_done
+        last_key, done = (state.last_key, state.rows_done) if state else (None, 0)
+        if state is None:
+            db.session.execute(sa.insert(migration_progress).values(
+                version=self.version, step=step, last_key=None, rows_done=0, finished=False,
+                updated_at=datetime.utcnow()))
+            db.session.commit()
+
+        key_col = table.c[key]
+        remaining = db.session.scalar(
+            sa.select(sa.func.count()).select_from(table)
+            .where(where, *([key_col > last_key] if last_key is not None else [])))
+        total = done + remaining
+        if last_key is not None:
+            self.progress(f'  {step}: resuming after {key} {last_key} ({done}/{total})')
+        started = time.monotonic()
+        query = sa.select(key_col, *[table.c[c] for c in columns]).where(where).order_by(key_col).limit(self.batch_size)
+        while True:
+            rows = db.session.execute(
+                query.where(key_col > last_key) if last_key is not None else query).all()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                values = compute(row)
+                if values:
+                    updates.append(dict(values, _key=row[0]))
+            for names in {tuple(sorted(u)) for u in updates}:
+                batch = [u for u in updates if tuple(sorted(u)) == names]
+                db.session.execute(
+                    sa.update(table).where(key_col == sa.bindparam('_key'))
+                    .values({n: sa.bindparam(n) for n in names if n != '_key'}),
+                    batch,
+                )
+            last_key = rows[-1][0]
+            done += len(updates)
+            db.session.execute(
+                sa.update(migration_progress)
+                .where(migration_progress.c.version == self.version, migration_progress.c.step == step)
+                .values(last_key=last_key, rows_done=done, updated_at=datetime.utcnow()))
+            db.session.commit()
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.progress(f'  {step}: {done}/{total} rows ({rate:,.0f} rows/s)')
+        db.session.execute(
+            sa.update(migration_progress)
+            .where(migration_progress.c.version == self.version, migration_progress.c.step == step)
+            .values(finished=True, updated_at=datetime.utcnow()))
+        db.session.commit()
+        return done
+
+
+def _load():
+    from . import versions  # noqa: F401  (registers the migrations)
+    return sorted(MIGRATIONS, key=lambda m: m.version)
+
+
+def applied_versions():
+    schema_migrations.create(db.engine, checkfirst=True)
+    migration_progress.create(db.engine, checkfirst=True)
+    return {row.version: row.applied_at for row in db.session.execute(sa.select(schema_migrations))}
+
+
+def status():
+    """``[(migration, applied_at or None), ...]`` in version order."""
+    applied = applied_versions()
+    return [(m, applied.get(m.version)) for m in _load()]
+
+
+def migrate(target=None, batch_size=None, progress=print):
+    """Apply pending migrations up to ``target`` (all by default). Returns the versions applied."""
+    batch_size = batch_size or current_app.config.get('MIGRATION_BATCH_SIZE', 1000)
+    applied = applied_versions()
+    done = []
+    for m in _load():
+        if m.version in applied:
+            continue
+        if target is not None and m.version > target:
+            break
+        progress(f'→ {m.version} {m.name}')
+        m.run(MigrationContext(m.version, batch_size, progress))
+        db.session.execute(sa.insert(schema_migrations).values(
+            version=m.version, name=m.name, applied_at=datetime.utcnow()))
+        db.session.commit()
+        done.append(m.version)
+    return done
@@ -0,0 +1,86 @@
+"""The schema history, oldest first. Never edit an applied migration; add a new one."""
+from datetime import date
+import sqlalchemy as sa
+from . import migration
+
+
+@migration('0001', 'base schema')
+def base_schema(ctx):
+    # Creates missing tables only; columns added later to existing tables follow below
+    ctx.create_all()
+
+
+@migration('0002', 'order booking_date')
+def order_booking_date(ctx):
+    ctx.add_column('order', 'booking_date DATE')
+    order = sa.table('order', sa.column('id', sa.Integer), sa.column('created_at', sa.DateTime),
+                     sa.column('booking_date', sa.Date))
+    today = date.today()
+    done = ctx.backfill(
+        'booking_date', order, ['created_at'], order.c.booking_date.is_(None),
+        lambda row: {'booking_date': row.created_at.date() if row.created_at else today},
+    )
+    ctx.progress(f'  booking_date set on {done} orders')
+
+
+@migration('0003', 'order and user lookup indexes')
+def lookup_indexes(ctx):
+    ctx.create_index('ix_order_slot_date', 'order', 'time_slot_id, booking_date')
+    ctx.create_index('ix_order_partner_created', 'order', 'partner_id, created_at')
+    ctx.create_index('ix_order_partner_name', 'order', 'partner_id, lower(name)')
+    ctx.create_index('ix_order_partner_reg_no', 'order', 'partner_id, lower(college_reg_no)')
+    ctx.create_index('ix_order_partner_order_ref', 'order', 'partner_id, lower(order_id_text)')
+    ctx.create_index('ix_user_username_lower', 'user', 'lower(username)')
+
+
+@migration('0004', 'time slot minutes')
+def slot_minutes(ctx):
+    from ..clock import parse_clock
+    ctx.add_column('time_slot', 'start_minute INTEGER')
+    ctx.add_column('time_slot', 'end_minute INTEGER')
+    slot = sa.table('time_slot', sa.column('id', sa.Integer), sa.column('start_time', sa.String),
+                    sa.column('end_time', sa.String), sa.column('start_minute', sa.Integer),
+                    sa.column('end_minute', sa.Integer))
+
+    def minutes(row):
+        try:
+            return {'start_minute': parse_clock(row.start_time), 'end_minute': parse_clock(row.end_time)}
+        except ValueError:
+            ctx.progress(f'! Slot {row.id} has unreadable times {row.start_time!r} - {row.end_time!r}; fix it by hand')
+            return None
+
+    ctx.backfill('slot_minutes', slot, ['start_time', 'end_time'], slot.c.start_minute.is_(None), minutes)
+    # Interval index replaces the old (partner_id, day_of_week) one
+    ctx.create_index('ix_time_slot_partner_day_start', 'time_slot',
+                     'partner_id, day_of_week, start_minute, end_minute')
+    ctx.drop_index('ix_time_slot_partner_day')
+
+
+@migration('0005', 'admin directory search index')
+def directory_index(ctx):
+    from ..search import ensure_directory_index
+    ensure_directory_index()
+
+
+@migration('0006', 'order archive table')
+def order_archive(ctx):
+    from ..models import OrderArchive
+    ctx.create_table(OrderArchive.__table__)
+    ctx.create_index('ix_order_user_created', 'order', 'user_id, created_at')
+
+
+@migration('0007', 'slot holds')
+def slot_holds(ctx):
+    from ..models import SlotHold
+    ctx.create_table(SlotHold.__table__)
+
+
+@migration('0008', 'order rollup')
+def order_rollup(ctx):
+    from .. import db
+    from ..booking import rebuild_rollups
+    from ..models import OrderRollup
+    ctx.create_table(OrderRollup.__table__)
+    # One aggregate INSERT ... SELECT over live and archived orders
+    rebuild_rollups()
+    db.session.commit()
@@ -1,8 +1,19 @@
 ﻿from datetime import datetime
+from functools import lru_cache
 from flask import current_app
+from sqlalchemy import false, func, select, true, union_all
+from sqlalchemy.orm import validates
 from flask_login import UserMixin
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
+from .clock import format_clock
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method):
+    """The method field werkzeug stores for ``method``, defaults filled in ('scrypt' -> 'scrypt:32768:8:1')."""
+    return generate_password_hash('-', method=method).split('$', 1)[0]
 
 
 class User(db.Model, UserMixin):
@@ -20,6 +31,19 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+    # Password helpers; PASSWORD_HASH_METHOD picks the werkzeug method and its cost
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+    def check_password(self, password):
+        """True if ``password`` matches. A hash made with other parameters is
+        upgraded to the configured method on the way; the caller commits."""
+        if not check_password_hash(self.password_hash, password):
+            return False
+        if self.password_hash.split('$', 1)[0] != _hash_prefix(current_app.config['PASSWORD_HASH_METHOD']):
+            self.set_password(password)
+        return True
+
     # Password reset token helpers
     def get_reset_token(self) -> str:
         s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
@@ -35,6 +59,10 @@ class User(db.Model, UserMixin):
         return User.query.get(data.get('user_id'))
 
 
+# Case-insensitive sign-in and uniqueness checks on username
+db.Index('ix_user_username_lower', func.lower(User.username))
+
+
 class Partner(db.Model):
     __tablename__ = 'partner'
     id = db.Column(db.Integer, primary_key=True)
@@ -53,23 +81,42 @@ class Partner(db.Model):
 
 class TimeSlot(db.Model):
     __tablename__ = 'time_slot'
+    __table_args__ = (
+        # Interval lookups: a partner's slots for a weekday, ordered by start
+        db.Index('ix_time_slot_partner_day_start', 'partner_id', 'day_of_week', 'start_minute', 'end_minute'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     partner_id = db.Column(db.Integer, db.ForeignKey('partner.id'), nullable=False)
     day_of_week = db.Column(db.String(20), nullable=False)
-    start_time = db.Column(db.String(20), nullable=False)
-    end_time = db.Column(db.String(20), nullable=False)
+    start_time = db.Column(db.String(20), nullable=False)  # display copy of start_minute
+    end_time = db.Column(db.String(20), nullable=False)  # display copy of end_minute
+    start_minute = db.Column(db.Integer, nullable=True)  # minutes since midnight
+    end_minute = db.Column(db.Integer, nullable=True)
     max_capacity = db.Column(db.Integer, nullable=False, default=0)
 
     # Relationships
     partner = db.relationship('Partner', back_populates='time_slots')
     orders = db.relationship('Order', back_populates='time_slot')
 
+    @validates('start_minute', 'end_minute')
+    def _derive_display_time(self, key, minutes):
+        if minutes is not None:
+            setattr(self, 'start_time' if key == 'start_minute' else 'end_time', format_clock(minutes))
+        return minutes
+
     def __repr__(self):
         return f'<TimeSlot {self.day_of_week} {self.start_time}-{self.end_time} (cap={self.max_capacity})>'
 
 
 class Order(db.Model):
     __tablename__ = 'order'
+    __table_args__ = (
+        # Capacity lookups per slot/date and partner order listings
+        db.Index('ix_order_slot_date', 'time_slot_id', 'booking_date'),
+        db.Index('ix_order_partner_created', 'partner_id', 'created_at'),
+        # A student's order history (live half of OrderHistory)
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     partner_id = db.Column(db.Integer, db.ForeignKey('partner.id'), nullable=False)
@@ -91,3 +138,143 @@ class Order(db.Model):
 
     def __repr__(self):
         return f'<Order {self.order_platform}:{self.order_id_text} {self.status}>'
+
+
+# Case-insensitive prefix search in the partner order list
+db.Index('ix_order_partner_name', Order.partner_id, func.lower(Order.name))
+db.Index('ix_order_partner_reg_no', Order.partner_id, func.lower(Order.college_reg_no))
+db.Index('ix_order_partner_order_ref', Order.partner_id, func.lower(Order.order_id_text))
+
+
+class OrderArchive(db.Model):
+    """A Completed/Cancelled order moved out of ``order`` by the archive job; same id and columns."""
+    __tablename__ = 'order_archive'
+    __table_args__ = (
+        # User history, per-partner exports and the "slot has orders" checks
+        db.Index('ix_order_archive_user_created', 'user_id', 'created_at'),
+        db.Index('ix_order_archive_partner_date', 'partner_id', 'booking_date'),
+        db.Index('ix_order_archive_slot', 'time_slot_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    partner_id = db.Column(db.Integer, db.ForeignKey('partner.id'), nullable=False)
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id'), nullable=False)
+    order_platform = db.Column(db.String(120), nullable=False)
+    order_id_text = db.Column(db.String(120), nullable=False)
+    college_reg_no = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(30), nullable=False)
+    type = db.Column('type', db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    booking_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<OrderArchive {self.order_platform}:{self.order_id_text} {self.status}>'
+
+
+ORDER_COLUMNS = ('id', 'user_id', 'partner_id', 'time_slot_id', 'order_platform', 'order_id_text',
+                 'college_reg_no', 'name', 'phone', 'type', 'status', 'booking_date', 'created_at')
+
+# Live and archived orders as one relation; filters are pushed down into both halves
+order_history = union_all(
+    select(*(Order.__table__.c[c] for c in ORDER_COLUMNS), false().label('archived')),
+    select(*(OrderArchive.__table__.c[c] for c in ORDER_COLUMNS), true().label('archived')),
+).subquery('order_history')
+
+
+class OrderHistory(db.Model):
+    """Read-only view over ``order`` and ``order_archive`` for history pages and exports."""
+    __table__ = order_history
+
+    user = db.relationship('User', primaryjoin='foreign(OrderHistory.user_id) == User.id', viewonly=True)
+    partner = db.relationship('Partner', primaryjoin='foreign(OrderHistory.partner_id) == Partner.id', viewonly=True)
+    time_slot = db.relationship('TimeSlot', primaryjoin='foreign(OrderHistory.time_slot_id) == TimeSlot.id',
+                                viewonly=True)
+
+    def __repr__(self):
+        return f'<OrderHistory {self.order_platform}:{self.order_id_text} {self.status}>'
+
+
+class SlotBookingCounter(db.Model):
+    """Seats claimed per (slot, date); the single row booking races are settled on."""
+    __tablename__ = 'slot_booking_counter'
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id'), primary_key=True)
+    booking_date = db.Column(db.Date, primary_key=True)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SlotBookingCounter {self.time_slot_id}@{self.booking_date} booked={self.booked}>'
+
+
+class OrderRollup(db.Model):
+    """Orders per (partner, slot, date, status), kept in step with every booking and status change.
+
+    Analytics read only this table. Archived orders stay counted; rebuild it
+    from the order history with ``scripts/rebuild_rollups.py``.
+    """
+    __tablename__ = 'order_rollup'
+    __table_args__ = (
+        # Covers the date-range aggregates, so analytics never touch the table rows
+        db.Index('ix_order_rollup_date', 'booking_date', 'partner_id', 'status', 'time_slot_id', 'orders'),
+    )
+    # No foreign keys: derived data that must never block changes to slots or partners
+    partner_id = db.Column(db.Integer, primary_key=True)
+    time_slot_id = db.Column(db.Integer, primary_key=True)
+    booking_date = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OrderRollup {self.time_slot_id}@{self.booking_date} {self.status}={self.orders}>'
+
+
+class SlotHold(db.Model):
+    """A seat set aside for a student while they fill in the booking form.
+
+    The seat is claimed on ``slot_booking_counter`` like an order's; booking
+    turns the hold into the order, and expired holds hand the seat back.
+    """
+    __tablename__ = 'slot_hold'
+    __table_args__ = (
+        db.Index('ix_slot_hold_slot_date', 'time_slot_id', 'booking_date', 'expires_at'),
+        # The sweeper walks holds in expiry order
+        db.Index('ix_slot_hold_expires', 'expires_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    time_slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id'), nullable=False)
+    booking_date = db.Column(db.Date, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<SlotHold {self.time_slot_id}@{self.booking_date} until {self.expires_at:%H:%M:%S}>'
+
+
+class OutboxMessage(db.Model):
+    """An email waiting to be sent; written in the same transaction as the change it reports."""
+    __tablename__ = 'outbox_message'
+    __table_args__ = (
+        # Workers poll for due messages
+        db.Index('ix_outbox_status_due', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'confirmation' | 'reminder'
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    dedupe_key = db.Column(db.String(120), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending' | 'sending' | 'sent' | 'failed' | 'skipped'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)  # local time, like booking dates
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.kind} to {self.recipient} {self.status}>'
@@ -0,0 +1,72 @@
+"""Order listings with server-side filters and keyset (cursor) pagination."""
+from datetime import datetime
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.orm import joinedload
+from .models import Order, TimeSlot
+
+
+PAGE_SIZE = 50
+
+# Filters accepted from the partner dashboard query string
+PARTNER_ORDER_FILTERS = ('student', 'order_id', 'day', 'type')
+
+
+def encode_cursor(order):
+    return f'{order.created_at.isoformat()}_{order.id}'
+
+
+def decode_cursor(cursor):
+    """``(created_at, id)`` from a cursor string, or None if it is malformed."""
+    try:
+        created_at, order_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _prefix(column, term):
+    # Range on lower(column) so the (partner_id, lower(column)) indexes apply
+    term = term.lower()
+    return (func.lower(column) >= term) & (func.lower(column) < term + '\uffff')
+
+
+def partner_orders_query(partner_id, filters):
+    """Partner's orders matching the dashboard filters, newest first."""
+    # Every row shows its slot; join it in rather than lazy-loading per row
+    query = Order.query.filter(Order.partner_id == partner_id).options(joinedload(Order.time_slot, innerjoin=True))
+
+    student = (filters.get('student') or '').strip()
+    if student:
+        query = query.filter(or_(_prefix(Order.name, student), _prefix(Order.college_reg_no, student)))
+
+    order_ref = (filters.get('order_id') or '').strip()
+    if order_ref:
+        matches = _prefix(Order.order_id_text, order_ref)
+        if order_ref.isdigit():
+            matches = or_(Order.id == int(order_ref), matches)
+        query = query.filter(matches)
+
+    day = filters.get('day')
+    if day:
+        slot_ids = select(TimeSlot.id).where(TimeSlot.partner_id == partner_id, TimeSlot.day_of_week == day)
+        query = query.filter(Order.time_slot_id.in_(slot_ids))
+
+    type_ = filters.get('type')
+    if type_:
+        query = query.filter(Order.type == type_)
+
+    return query.order_by(Order.created_at.desc(), Order.id.desc())
+
+
+def paginate(query, cursor=None, page_size=PAGE_SIZE):
+    """One page of a newest-first order query plus the cursor for the next page.
+
+    Cost depends on ``page_size`` only: the cursor seeks straight to the
+    first row older than the last one shown instead of counting an OFFSET.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query = query.filter(tuple_(Order.created_at, Order.id) < position)
+    rows = query.limit(page_size + 1).all()
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
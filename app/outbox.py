@@ -0,0 +1,207 @@
+"""Transactional email outbox.
+
+Requests only ``enqueue`` rows into ``outbox_message`` inside their own
+transaction; ``drain`` (run by ``scripts/mail_worker.py``) claims due rows in
+batches and sends each batch over one pooled SMTP connection, retrying
+failures with exponential backoff.
+"""
+import smtplib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import or_, select, update
+from . import db, mail
+from .booking import _insert_ignore
+from .models import OutboxMessage, Order, TimeSlot, User
+
+
+outbox = OutboxMessage.__table__
+
+# How long a claimed batch stays locked before another worker may retry it
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue(kind, recipient, subject, body, order_id=None, dedupe_key=None, send_at=None):
+    """Add a message to the current transaction; the caller commits. No-op without a recipient."""
+    if not recipient:
+        return None
+    message = OutboxMessage(
+        kind=kind, order_id=order_id, recipient=recipient, subject=subject, body=body,
+        dedupe_key=dedupe_key, next_attempt_at=send_at or datetime.now(),
+    )
+    db.session.add(message)
+    return message
+
+
+def _slot_line(order, slot):
+    return f'{order.booking_date:%A %d %b %Y}, {slot.start_time} - {slot.end_time}'
+
+
+def queue_confirmation(order, user, slot):
+    """Booking confirmation for a flushed order."""
+    return enqueue(
+        'confirmation', user.email,
+        f'Booking confirmed: {order.order_platform} {order.type.lower()}',
+        f'Hi {order.name},\n\nYour {order.type.lower()} for {order.order_platform} order '
+        f'{order.order_id_text} is booked for {_slot_line(order, slot)}.\n',
+        order_id=order.id, dedupe_key=f'confirmation:{order.id}',
+    )
+
+
+def schedule_reminders(now=None, horizon=timedelta(hours=24)):
+    """Queue a reminder for every booked order whose slot starts within ``horizon``.
+
+    One query finds the orders per slot-date and one INSERT adds the messages;
+    each order's dedupe key makes repeated runs harmless. Reminders go out
+    ``MAIL_REMINDER_LEAD`` minutes before the slot starts. Returns the number
+    of orders considered.
+    """
+    now = now or datetime.now()
+    lead = timedelta(minutes=current_app.config['MAIL_REMINDER_LEAD'])
+    end = now + horizon
+    windows = []
+    day = now.date()
+    while day <= end.date():
+        lo = now.hour * 60 + now.minute if day == now.date() else -1
+        hi = end.hour * 60 + end.minute if day == end.date() else 24 * 60
+        windows.append((Order.booking_date == day) & (TimeSlot.start_minute > lo) & (TimeSlot.start_minute <= hi))
+        day += timedelta(days=1)
+
+    rows = db.session.execute(
+        select(Order.id, Order.name, Order.type, Order.order_platform, Order.order_id_text,
+               Order.booking_date, TimeSlot.start_minute, TimeSlot.start_time, TimeSlot.end_time, User.email)
+        .join(TimeSlot, Order.time_slot_id == TimeSlot.id)
+        .join(User, Order.user_id == User.id)
+        .where(Order.status == 'Booked', User.email.isnot(None), or_(*windows))
+    ).all()
+    if not rows:
+        return 0
+    messages = []
+    for row in rows:
+        starts = datetime.combine(row.booking_date, datetime.min.time()) + timedelta(minutes=row.start_minute)
+        messages.append({
+            'kind': 'reminder',
+            'order_id': row.id,
+            'recipient': row.email,
+            'subject': f'Reminder: your {row.type.lower()} slot starts at {row.start_time}',
+            'body': f'Hi {row.name},\n\nYour {row.type.lower()} for {row.order_platform} order '
+                    f'{row.order_id_text} is at {row.start_time} - {row.end_time} today.\n',
+            'dedupe_key': f'reminder:{row.id}',
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': max(starts - lead, now),
+            'created_at': datetime.utcnow(),
+        })
+    db.session.execute(_insert_ignore(outbox), messages)
+    db.session.commit()
+    return len(messages)
+
+
+def claim_batch(limit, now=None):
+    """Lock up to ``limit`` due messages for this worker and return them.
+
+    Rows left in 'sending' by a crashed worker become due again once their
+    lease runs out.
+    """
+    now = now or datetime.now()
+    token = uuid.uuid4().hex
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status.in_(('pending', 'sending')), OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(limit)
+    )
+    ids = list(db.session.scalars(due))
+    if not ids:
+        return []
+    # The status/due re-check makes the claim safe against a worker racing for the same ids
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), OutboxMessage.status.in_(('pending', 'sending')),
+               OutboxMessage.next_attempt_at <= now)
+        .values(status='sending', claim_token=token, next_attempt_at=now + CLAIM_LEASE)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(claim_token=token, status='sending').all()
+
+
+def _backoff(attempts):
+    base = current_app.config['MAIL_RETRY_BACKOFF']
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 6 * 3600))
+
+
+def _record_failure(message, error, now):
+    message.attempts += 1
+    message.last_error = str(error)[:500]
+    if message.attempts >= current_app.config['MAIL_MAX_ATTEMPTS']:
+        message.status = 'failed'
+    else:
+        message.status = 'pending'
+        message.next_attempt_at = now + _backoff(message.attempts)
+
+
+def deliver_batch(messages):
+    """Send claimed messages over one SMTP connection. Returns (sent, failed)."""
+    now = datetime.now()
+    # Reminders for orders cancelled since they were queued are dropped
+    reminder_orders = {m.order_id for m in messages if m.kind == 'reminder'}
+    live = set(db.session.scalars(
+        select(Order.id).where(Order.id.in_(reminder_orders), Order.status == 'Booked')
+    )) if reminder_orders else set()
+
+    sent = failed = 0
+    try:
+        with mail.connect() as conn:
+            for message in messages:
+                if message.kind == 'reminder' and message.order_id not in live:
+                    message.status = 'skipped'
+                    continue
+                try:
+                    try:
+                        conn.send(Message(message.subject, recipients=[message.recipient], body=message.body))
+                    except smtplib.SMTPServerDisconnected:
+                        conn.host = conn.configure_host()
+                        conn.send(Message(message.subject, recipients=[message.recipient], body=message.body))
+                except (smtplib.SMTPException, OSError) as e:
+                    _record_failure(message, e, now)
+                    failed += 1
+                    continue
+                message.status = 'sent'
+                message.attempts += 1
+                message.sent_at = datetime.utcnow()
+                message.claim_token = None
+                sent += 1
+    except (smtplib.SMTPException, OSError) as e:
+        # Could not connect (or the connection died for good): retry whatever is still claimed
+        for message in messages:
+            if message.status == 'sending':
+                _record_failure(message, e, now)
+                failed += 1
+    db.session.commit()
+    return sent, failed
+
+
+def _drain_worker(app, batch_size):
+    sent = failed = 0
+    with app.app_context():
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            s, f = deliver_batch(batch)
+            sent, failed = sent + s, failed + f
+        db.session.remove()
+    return sent, failed
+
+
+def drain(app=None, workers=None, batch_size=None):
+    """Send every due message using a pool of workers. Returns (sent, failed)."""
+    app = app or current_app._get_current_object()
+    workers = workers or app.config['MAIL_WORKERS']
+    batch_size = batch_size or app.config['MAIL_BATCH_SIZE']
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: _drain_worker(app, batch_size), range(workers)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
@@ -1,18 +1,34 @@
-﻿from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, abort
+﻿from flask import Blueprint, current_app, render_template, redirect, url_for, request, flash, jsonify, abort, Response, stream_with_context
 from flask_login import login_required, current_user, login_user, logout_user
 from flask_mail import Message
-from werkzeug.security import generate_password_hash, check_password_hash
-from . import login_manager, db, mail
-from .models import User, Partner, TimeSlot, Order
+from . import login_manager, db, mail, availability_cache, identity_cache, metrics, admission, events
+from .models import User, Partner, TimeSlot, OrderHistory, SlotBookingCounter, SlotHold
+from .booking import bulk_set_status
+from .holds import place_hold, release_hold, drop_holds_of, announce_freed
+from .availability import slot_availability, cached_slot_availability, availability_changed, availability_calendar, next_available, MAX_CALENDAR_DAYS
+from .orders import partner_orders_query, paginate, PARTNER_ORDER_FILTERS
+from .search import search_users, search_partners, summary_counts
+from .analytics import utilization, partner_volume, week_range
+from .export import export_query, export_chunks, parse_export_filters, attachment_header, EXPORT_FORMATS
+from .slot_templates import template_from_form, plan_template, apply_plan, DAYS
+from .clock import parse_clock
+from .slots import find_overlap
+from .writer import book
+from .live import availability_stream, orders_stream, orders_updated, BUSY_RETRY_MS
+from .identity import load_identity, forget_user, find_login_user, credentials_taken
+from .database import replica_reads, replica_stream
+from .web import Validators
 from .forms import RegistrationForm, LoginForm, RequestResetForm, ResetPasswordForm, ChangePasswordForm
-from datetime import datetime
+from sqlalchemy import case
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
 
 bp = Blueprint('main', __name__)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_identity(int(user_id))
 
 
 # -------------------- Authentication --------------------
@@ -29,13 +45,12 @@ def signin():
         return redirect(url_for('main.dashboard'))
     form = LoginForm()
     if form.validate_on_submit():
-        ident = form.email.data.strip()
-        user = User.query.filter_by(email=ident.lower()).first()
-        if not user:
-            user = User.query.filter_by(username=ident).first()
-        if not user or not check_password_hash(user.password_hash, form.password.data):
+        user = find_login_user(form.email.data)
+        if not user or not user.check_password(form.password.data):
             flash('Invalid email/username or password', 'warning')
             return render_template('signin.html', form=form)
+        if db.session.is_modified(user):
+            db.session.commit()  # password re-hashed with the current PASSWORD_HASH_METHOD
         login_user(user, remember=form.remember.data)
         return redirect(url_for('main.dashboard'))
     return render_template('signin.html', form=form)
@@ -56,9 +71,9 @@ def signup():
         user = User(
             username=form.username.data.strip(),
             email=form.email.data.lower(),
-            password_hash=generate_password_hash(form.password.data),
             role=form.role.data,
         )
+        user.set_password(form.password.data)
         db.session.add(user)
         db.session.flush()
         if user.role == 'partner':
@@ -91,11 +106,12 @@ def change_password():
         if user.email.lower() != form.email.data.lower():
             flash('Invalid username, email, or password', 'warning')
             return render_template('change_password.html', form=form)
-        if not check_password_hash(user.password_hash, form.old_password.data):
+        if not user.check_password(form.old_password.data):
             flash('Invalid username, email, or password', 'warning')
             return render_template('change_password.html', form=form)
-        user.password_hash = generate_password_hash(form.new_password.data)
+        user.set_password(form.new_password.data)
         db.session.commit()
+        forget_user(user.id)
         flash('Your password has been updated! You can now sign in.', 'success')
         return redirect(url_for('main.signin'))
     return render_template('change_password.html', form=form)
@@ -116,8 +132,13 @@ def dashboard():
 
 @bp.route('/user_dashboard')
 @login_required
+@replica_reads
 def user_dashboard():
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+    # Live and archived orders in one query; slot and partner are rendered for every row
+    orders = (OrderHistory.query.filter_by(user_id=current_user.id)
+              .options(joinedload(OrderHistory.time_slot, innerjoin=True),
+                       joinedload(OrderHistory.partner, innerjoin=True))
+              .order_by(OrderHistory.created_at.desc(), OrderHistory.id.desc()).all())
     return render_template('dashboard_user.html', orders=orders)
 
 
@@ -130,33 +151,75 @@ def user_dashboard():
 # -------------------- Partner --------------------
 @bp.route('/partner_dashboard', methods=['GET', 'POST'])
 @login_required
+@replica_reads
 def partner_dashboard():
     if current_user.role != 'partner':
         abort(403)
     partner = Partner.query.filter_by(user_id=current_user.id).first()
     if not partner:
         flash('Partner profile not found', 'warning')
-        return render_template('dashboard_partner.html', partner=None, orders=[], slots=[])
+        return render_template('dashboard_partner.html', partner=None, orders=[], slots=[], filters={})
 
+    template_plan = None
     if request.method == 'POST':
         action = request.form.get('action')
-        if action == 'create_slot':
+        if action in ('preview_template', 'apply_template'):
+            try:
+                desired = template_from_form(request.form)
+            except ValueError as e:
+                flash(str(e), 'warning')
+            else:
+                template_plan = plan_template(partner.id, desired, remove_missing=bool(request.form.get('remove_missing')))
+                if action == 'apply_template':
+                    apply_plan(partner.id, template_plan)
+                    availability_changed(partner.id)
+                    flash(f"Slot template applied: {len(template_plan['create'])} created, "
+                          f"{len(template_plan['update'])} updated, {len(template_plan['delete'])} removed, "
+                          f"{len(template_plan['preserved'])} kept because they have orders, "
+                          f"{len(template_plan['conflicts'])} skipped as overlapping", 'success')
+                    template_plan = None
+        elif action == 'set_status':
+            # Whole slot-date batches (or ticked orders) at the pickup desk
+            selection = {'partner_id': partner.id}
+            order_ids = request.form.getlist('order_ids', type=int)
+            if order_ids:
+                selection['order_ids'] = order_ids
+            if request.form.get('slot_id', type=int):
+                selection['slot_id'] = request.form.get('slot_id', type=int)
+            try:
+                if request.form.get('booking_date'):
+                    selection['booking_date'] = datetime.strptime(request.form['booking_date'], '%Y-%m-%d').date()
+                updated = _set_status(request.form.get('status'), **selection)
+            except ValueError as e:
+                flash(str(e), 'warning')
+            else:
+                flash(f"{updated} order(s) marked {request.form.get('status')}", 'success')
+        elif action == 'create_slot':
             day_of_week = request.form.get('day_of_week')
             start_time = request.form.get('start_time')
             end_time = request.form.get('end_time')
             max_capacity = request.form.get('max_capacity', type=int)
+            try:
+                start_minute, end_minute = parse_clock(start_time), parse_clock(end_time)
+            except ValueError:
+                start_minute = end_minute = None
             if not all([day_of_week, start_time, end_time]) or max_capacity is None:
                 flash('All slot fields are required', 'warning')
+            elif start_minute is None or end_minute <= start_minute:
+                flash('Enter times like 10:00 AM, with the end after the start', 'warning')
+            elif (overlap := find_overlap(partner.id, day_of_week, start_minute, end_minute)):
+                flash(f'Overlaps your {overlap.day_of_week} {overlap.start_time} - {overlap.end_time} slot', 'warning')
             else:
                 slot = TimeSlot(
                     partner_id=partner.id,
                     day_of_week=day_of_week,
-                    start_time=start_time,
-                    end_time=end_time,
+                    start_minute=start_minute,
+                    end_minute=end_minute,
                     max_capacity=max_capacity,
                 )
                 db.session.add(slot)
                 db.session.commit()
+                availability_changed(partner.id)
                 flash('Time slot created', 'success')
         elif action == 'delete_slot':
             slot_id = request.form.get('slot_id', type=int)
@@ -164,17 +227,92 @@ def partner_dashboard():
             if not slot:
                 flash('Slot not found', 'warning')
             else:
-                has_orders = Order.query.filter_by(time_slot_id=slot.id).first() is not None
+                has_orders = OrderHistory.query.filter_by(time_slot_id=slot.id).first() is not None
                 if has_orders:
                     flash('Cannot delete slot with existing orders', 'warning')
                 else:
+                    # Holds go with the slot; a student mid-form finds it gone on submit
+                    SlotHold.query.filter_by(time_slot_id=slot.id).delete()
+                    SlotBookingCounter.query.filter_by(time_slot_id=slot.id).delete()
                     db.session.delete(slot)
                     db.session.commit()
+                    availability_changed(partner.id)
                     flash('Time slot deleted', 'success')
 
-    orders = Order.query.filter_by(partner_id=partner.id).order_by(Order.created_at.desc()).all()
-    slots = TimeSlot.query.filter_by(partner_id=partner.id).all()
-    return render_template('dashboard_partner.html', partner=partner, orders=orders, slots=slots)
+    # One page of orders; filters and cursor come from the query string
+    filters = {key: request.args[key] for key in PARTNER_ORDER_FILTERS if request.args.get(key)}
+    cursor = request.args.get('cursor')
+    orders, next_cursor = paginate(partner_orders_query(partner.id, filters), cursor)
+    weekday_order = case({day: n for n, day in enumerate(DAYS)}, value=TimeSlot.day_of_week)
+    slots = TimeSlot.query.filter_by(partner_id=partner.id).order_by(weekday_order, TimeSlot.start_minute).all()
+    return render_template('dashboard_partner.html', partner=partner, orders=orders, slots=slots,
+                           filters=filters, cursor=cursor, next_cursor=next_cursor,
+                           template_plan=template_plan, template_form=request.form)
+
+
+
+
+def _export_response(filters, name):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    gzip = request.args.get('gzip') == '1'
+    filename = f"{name}-{datetime.now():%Y%m%d}.{fmt}" + ('.gz' if gzip else '')
+    body = stream_with_context(replica_stream(export_chunks(export_query(filters), fmt, gzip)))
+    return Response(body, mimetype='application/gzip' if gzip else EXPORT_FORMATS[fmt], headers={
+        'Content-Disposition': attachment_header(filename),
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def _event_stream(chunks):
+    if not events.open_stream():
+        # Full: say when to come back rather than tie up another connection
+        return Response(f'retry: {BUSY_RETRY_MS}\n\n', status=503, mimetype='text/event-stream', headers={
+            'Retry-After': str(BUSY_RETRY_MS // 1000),
+            'Cache-Control': 'no-cache',
+        })
+    body = stream_with_context(replica_stream(chunks))
+    response = Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Runs after the app context is gone, so bind this app's broker now
+    response.call_on_close(events.backend.close_stream)
+    return response
+
+
+@bp.route('/partner/orders/stream')
+@login_required
+def partner_orders_stream():
+    if current_user.role != 'partner':
+        abort(403)
+    partner = Partner.query.filter_by(user_id=current_user.id).first_or_404()
+    return _event_stream(orders_stream(partner.id))
+
+
+@bp.route('/partner/analytics')
+@login_required
+@replica_reads
+def partner_analytics():
+    if current_user.role != 'partner':
+        abort(403)
+    partner = Partner.query.filter_by(user_id=current_user.id).first_or_404()
+    return _analytics_page(partner)
+
+
+@bp.route('/partner/orders/export')
+@login_required
+def partner_orders_export():
+    if current_user.role != 'partner':
+        abort(403)
+    partner = Partner.query.filter_by(user_id=current_user.id).first_or_404()
+    try:
+        filters = parse_export_filters(request.args)
+    except ValueError:
+        abort(400)
+    filters['partner_id'] = partner.id
+    return _export_response(filters, f'orders-{partner.platform_name}')
 
 
 
@@ -182,6 +320,7 @@ def partner_dashboard():
 # -------------------- Admin --------------------
 @bp.route('/admin_dashboard', methods=['GET', 'POST'])
 @login_required
+@replica_reads
 def admin_dashboard():
     if current_user.role != 'admin':
         abort(403)
@@ -195,10 +334,11 @@ def admin_dashboard():
             password = request.form.get('password')
             if not all([platform_name, username, password]):
                 flash('Platform name, username, and password are required', 'warning')
-            elif User.query.filter_by(username=username).first():
+            elif credentials_taken(username, None)[0]:
                 flash('Username already exists', 'warning')
             else:
-                user = User(username=username, password_hash=generate_password_hash(password), role='partner')
+                user = User(username=username, role='partner')
+                user.set_password(password)
                 db.session.add(user)
                 db.session.flush()  # get user.id
                 partner = Partner(platform_name=platform_name, contact_email=contact_email, user_id=user.id)
@@ -211,12 +351,16 @@ def admin_dashboard():
             if not user:
                 flash('User not found', 'warning')
             else:
+                # Holds and seat counters reference the user and their slots without a cascade
+                freed = drop_holds_of(user)
                 # If partner, delete partner profile first
                 if user.role == 'partner' and user.partner_profile:
                     # Deleting partner will cascade delete time slots
                     db.session.delete(user.partner_profile)
                 db.session.delete(user)
                 db.session.commit()
+                announce_freed(freed)
+                forget_user(user_id)
                 flash('User deleted', 'success')
         elif action == 'set_role':
             user_id = request.form.get('user_id', type=int)
@@ -230,22 +374,126 @@ def admin_dashboard():
                 else:
                     user.role = role
                     db.session.commit()
+                    forget_user(user_id)
                     flash('Role updated', 'success')
 
-    users = User.query.order_by(User.id.asc()).all()
-    partners = Partner.query.order_by(Partner.platform_name.asc()).all()
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template('dashboard_admin.html', users=users, partners=partners, orders=orders)
+        # Back to the same search/page the admin was looking at
+        return redirect(url_for('main.admin_dashboard', **request.args))
+
+    users, next_user = search_users(request.args.get('q'), request.args.get('role'),
+                                    request.args.get('users_after', type=int))
+    partners, next_partner = search_partners(request.args.get('pq'), request.args.get('partners_after', type=int))
+    return render_template('dashboard_admin.html', users=users, partners=partners, summary=summary_counts(),
+                           next_user=next_user, next_partner=next_partner, args=request.args.to_dict())
+
+
+@bp.route('/admin/analytics')
+@login_required
+@replica_reads
+def admin_analytics():
+    if current_user.role != 'admin':
+        abort(403)
+    partner_id = request.args.get('partner_id', type=int)
+    partner = Partner.query.get_or_404(partner_id) if partner_id else None
+    return _analytics_page(partner, partners=Partner.query.order_by(Partner.platform_name).all())
+
+
+def _analytics_page(partner, partners=None):
+    """Utilization heatmap, weekly series and per-partner volume, all from the order rollup."""
+    weeks = request.args.get('weeks', 8, type=int)
+    start, end = week_range(weeks)
+    partner_id = partner.id if partner else None
+    return render_template('analytics.html', title='Analytics', partner=partner, partners=partners,
+                           weeks=weeks, start=start, end=end,
+                           usage=utilization(start, end, partner_id),
+                           volume=partner_volume(start, end, partner_id))
+
+
+@bp.route('/admin/api/users')
+@login_required
+@replica_reads
+def admin_api_users():
+    if current_user.role != 'admin':
+        abort(403)
+    users, next_after = search_users(request.args.get('q'), request.args.get('role'),
+                                     request.args.get('after', type=int))
+    return jsonify({
+        'items': [{'id': u.id, 'username': u.username, 'email': u.email, 'role': u.role} for u in users],
+        'next_after': next_after,
+    })
+
+
+@bp.route('/admin/api/partners')
+@login_required
+@replica_reads
+def admin_api_partners():
+    if current_user.role != 'admin':
+        abort(403)
+    partners, next_after = search_partners(request.args.get('q'), request.args.get('after', type=int))
+    return jsonify({
+        'items': [{
+            'id': p.id,
+            'platform_name': p.platform_name,
+            'contact_email': p.contact_email,
+            'username': p.user.username if p.user else None,
+        } for p in partners],
+        'next_after': next_after,
+    })
+
+
+
+
+@bp.route('/admin/orders/export')
+@login_required
+def admin_orders_export():
+    if current_user.role != 'admin':
+        abort(403)
+    try:
+        filters = parse_export_filters(request.args)
+    except ValueError:
+        abort(400)
+    return _export_response(filters, 'orders')
+
+
+@bp.route('/admin/cache_stats')
+@login_required
+def admin_cache_stats():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify({'availability': availability_cache.stats(), 'identity': identity_cache.stats()})
+
+
+@bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.role != 'admin':
+        abort(403)
+    body = metrics.render_prometheus({'availability': availability_cache.stats(), 'identity': identity_cache.stats()},
+                                     admission.stats())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/admin/metrics/slow_queries')
+@login_required
+def admin_slow_queries():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify({'threshold_ms': current_app.config['METRICS_SLOW_QUERY_MS'], 'queries': metrics.slow_queries()})
 
 
 
 
 # -------------------- API ROUTES --------------------
+def _time_window(args):
+    """Optional ``from_time``/``to_time`` query arguments as minutes since midnight."""
+    return tuple(parse_clock(args[key]) if args.get(key) else None for key in ('from_time', 'to_time'))
+
+
 @bp.route('/api/get_slots/<int:partner_id>')
 @login_required
+@admission.limit('api')
+@replica_reads
 def api_get_slots_by_id(partner_id):
-    partner = Partner.query.get_or_404(partner_id)
-    
     # Get selected date from query parameter, default to today
     date_str = request.args.get('date')
     if date_str:
@@ -255,30 +503,174 @@ def api_get_slots_by_id(partner_id):
             selected_date = datetime.now().date()
     else:
         selected_date = datetime.now().date()
-    
-    day_of_week = selected_date.strftime('%A')
-    slots = TimeSlot.query.filter_by(partner_id=partner.id, day_of_week=day_of_week).all()
-
-    available_slots = []
-    for slot in slots:
-        # Count bookings for this specific slot on this specific date
-        booked_count = Order.query.filter_by(
-            time_slot_id=slot.id,
-            booking_date=selected_date
-        ).count()
-        if booked_count < slot.max_capacity:
-            available_slots.append({
-                'id': slot.id,
-                'start_time': slot.start_time,
-                'end_time': slot.end_time,
-                'available_capacity': slot.max_capacity - booked_count,
-            })
-    return jsonify(available_slots)
+
+    try:
+        from_minute, to_minute = _time_window(request.args)
+    except ValueError:
+        return jsonify({'error': 'Times must look like 12:00 or 2:00 PM'}), 400
+    # Unchanged since the client's copy: answer 304 without touching the database
+    validators = Validators(*availability_cache.version(partner_id))
+    if validators.fresh:
+        return validators.not_modified()
+    if from_minute is None and to_minute is None:
+        slots = cached_slot_availability(partner_id, selected_date)
+    else:
+        slots = slot_availability(partner_id, selected_date, from_minute, to_minute)
+    if not slots:
+        # Only pay for the partner lookup when there is nothing to show
+        Partner.query.get_or_404(partner_id)
+
+    available_slots = [
+        {
+            'id': slot['id'],
+            'start_time': slot['start_time'],
+            'end_time': slot['end_time'],
+            'available_capacity': slot['available_capacity'],
+        }
+        for slot in slots if slot['available_capacity'] > 0
+    ]
+    return validators.apply(jsonify(available_slots))
+
+
+@bp.route('/api/availability/<int:partner_id>')
+@login_required
+@admission.limit('api')
+@replica_reads
+def api_availability(partner_id):
+    # Date range from query parameters, default to the coming week
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else datetime.now().date()
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else start + timedelta(days=6)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    if end < start:
+        return jsonify({'error': '"to" must not be before "from"'}), 400
+    end = min(end, start + timedelta(days=MAX_CALENDAR_DAYS - 1))
+
+    try:
+        from_minute, to_minute = _time_window(request.args)
+    except ValueError:
+        return jsonify({'error': 'Times must look like 12:00 or 2:00 PM'}), 400
+    validators = Validators(*availability_cache.version(partner_id))
+    if validators.fresh:
+        return validators.not_modified()
+    slots, grid = availability_calendar(partner_id, start, end, from_minute, to_minute)
+    if not slots:
+        Partner.query.get_or_404(partner_id)
+
+    return validators.apply(jsonify({
+        'partner_id': partner_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'slots': slots,
+        'grid': grid,
+        'next_available': next_available(slots, grid),
+    }))
+
+
+@bp.route('/api/availability/<int:partner_id>/stream')
+@login_required
+def api_availability_stream(partner_id):
+    try:
+        booking_date = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    Partner.query.get_or_404(partner_id)
+    return _event_stream(availability_stream(partner_id, booking_date))
+
+
+@bp.route('/api/holds', methods=['POST'])
+@login_required
+@admission.limit('api')
+@admission.queue()
+def api_place_hold():
+    data = request.get_json(silent=True) or {}
+    try:
+        slot_id = int(data['slot_id'])
+        booking_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'slot_id and date (YYYY-MM-DD) are required'}), 400
+    slot = TimeSlot.query.get_or_404(slot_id)
+    if booking_date < datetime.now().date() or booking_date.strftime('%A') != slot.day_of_week:
+        return jsonify({'error': f'This slot runs on {slot.day_of_week}s from today on'}), 400
+    hold = place_hold(current_user.id, slot, booking_date)
+    if hold is None:
+        return jsonify({'error': 'Selected time slot is full for that date'}), 409
+    return jsonify({
+        'token': hold.token,
+        'expires_at': hold.expires_at.isoformat() + 'Z',
+        'seconds': current_app.config['HOLD_SECONDS'],
+    }), 201
+
+
+@bp.route('/api/holds/<token>/release', methods=['POST'])
+@login_required
+def api_release_hold(token):
+    release_hold(current_user.id, token)
+    return '', 204
+
+
+def _set_status(status, **selection):
+    """Run a bulk status change, commit it and refresh availability; returns orders moved."""
+    updated, touched = bulk_set_status(status, **selection)
+    db.session.commit()
+    if status == 'Cancelled':
+        for partner_id, day in touched:
+            availability_changed(partner_id, day)
+    orders_updated(status, touched)
+    return updated
+
+
+@bp.route('/api/orders/status', methods=['POST'])
+@login_required
+def api_orders_status():
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    selection = {}
+    try:
+        if data.get('order_ids') is not None:
+            selection['order_ids'] = [int(i) for i in data['order_ids']]
+        if data.get('slot_id') is not None:
+            selection['slot_id'] = int(data['slot_id'])
+        for key, field in (('booking_date', 'booking_date'), ('date_from', 'from'), ('date_to', 'to')):
+            if data.get(field):
+                selection[key] = datetime.strptime(data[field], '%Y-%m-%d').date()
+        if data.get('type'):
+            selection['type_'] = data['type']
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid order ids, slot or date'}), 400
+
+    # Partners move their own orders, students may only cancel theirs, admins anything
+    if current_user.role == 'partner':
+        partner = Partner.query.filter_by(user_id=current_user.id).first_or_404()
+        selection['partner_id'] = partner.id
+    elif current_user.role == 'user':
+        if status != 'Cancelled':
+            abort(403)
+        selection['user_id'] = current_user.id
+
+    try:
+        updated = _set_status(status, **selection)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'status': status, 'updated': updated})
+
+
+@bp.route('/order/<int:order_id>/cancel', methods=['POST'])
+@login_required
+def order_cancel(order_id):
+    if _set_status('Cancelled', user_id=current_user.id, order_ids=[order_id]):
+        flash('Booking cancelled', 'success')
+    else:
+        flash('Only your booked orders can be cancelled', 'warning')
+    return redirect(url_for('main.user_dashboard'))
 
 
 # New unified New Order route (GET + POST)
 @bp.route('/order/new', methods=['GET', 'POST'])
 @login_required
+@admission.limit('booking', methods=('POST',))
+@admission.queue(methods=('POST',))
 def order_new():
     if request.method == 'POST':
         partner_id = request.form.get('partner_id')
@@ -312,36 +704,18 @@ def order_new():
             flash('Invalid time slot selection', 'warning')
             return redirect(url_for('main.order_new'))
 
-        # Capacity check for specific date
-        current_count = Order.query.filter_by(
-            time_slot_id=slot.id,
-            booking_date=booking_date
-        ).count()
-        if current_count >= slot.max_capacity:
-            flash('Selected time slot is full for that date', 'warning')
-            return redirect(url_for('main.order_new'))
-
         # Basic validation
         required = [order_id_text, college_reg_no, name, phone, type_]
         if any(not v for v in required):
             flash('All fields are required', 'warning')
             return redirect(url_for('main.order_new'))
 
-        order = Order(
-            user_id=current_user.id,
-            partner_id=partner.id,
-            time_slot_id=slot.id,
-            order_platform=partner.platform_name,
-            order_id_text=order_id_text,
-            college_reg_no=college_reg_no,
-            name=name,
-            phone=phone,
-            type=type_,
-            status='Booked',
-            booking_date=booking_date,
-        )
-        db.session.add(order)
-        db.session.commit()
+        # The seat held while the form was filled in (or a fresh one) is claimed in the order's transaction
+        fields = dict(order_id_text=order_id_text, college_reg_no=college_reg_no, name=name, phone=phone, type=type_)
+        if book(current_user._get_current_object(), partner, slot, booking_date, fields,
+                request.form.get('hold_token')) is None:
+            flash('Selected time slot is full for that date', 'warning')
+            return redirect(url_for('main.order_new'))
         flash('Order booked successfully', 'success')
         return redirect(url_for('main.user_dashboard'))
 
@@ -0,0 +1,155 @@
+"""Server-side search and summary counts for the admin dashboard.
+
+On SQLite, users and partners are searched through an FTS5 index
+(``directory_fts``) kept current by triggers; elsewhere (or when FTS5 is not
+compiled in) the same searches fall back to case-insensitive LIKE.
+"""
+from flask import current_app
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+from . import db
+from .models import User, Partner, OrderRollup
+
+
+PAGE_SIZE = 50
+
+# One FTS row per user (rowid = user.id); partners contribute platform_name
+_REFRESH_ROW = '''
+    DELETE FROM directory_fts WHERE rowid = {id};
+    INSERT INTO directory_fts(rowid, username, email, platform_name)
+    SELECT u.id, u.username, coalesce(u.email, ''), coalesce(p.platform_name, '')
+    FROM user u LEFT JOIN partner p ON p.user_id = u.id WHERE u.id = {id};
+'''
+
+_FTS_DDL = [
+    "CREATE VIRTUAL TABLE directory_fts USING fts5(username, email, platform_name)",
+    "CREATE TRIGGER directory_fts_user_ins AFTER INSERT ON user BEGIN"
+    + _REFRESH_ROW.format(id='new.id') + "END",
+    "CREATE TRIGGER directory_fts_user_upd AFTER UPDATE ON user BEGIN"
+    + _REFRESH_ROW.format(id='new.id') + "END",
+    "CREATE TRIGGER directory_fts_user_del AFTER DELETE ON user BEGIN "
+    "DELETE FROM directory_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER directory_fts_partner_ins AFTER INSERT ON partner BEGIN"
+    + _REFRESH_ROW.format(id='new.user_id') + "END",
+    "CREATE TRIGGER directory_fts_partner_upd AFTER UPDATE ON partner BEGIN"
+    + _REFRESH_ROW.format(id='old.user_id') + _REFRESH_ROW.format(id='new.user_id') + "END",
+    "CREATE TRIGGER directory_fts_partner_del AFTER DELETE ON partner BEGIN"
+    + _REFRESH_ROW.format(id='old.user_id') + "END",
+    "INSERT INTO directory_fts(rowid, username, email, platform_name) "
+    "SELECT u.id, u.username, coalesce(u.email, ''), coalesce(p.platform_name, '') "
+    "FROM user u LEFT JOIN partner p ON p.user_id = u.id",
+]
+
+_FTS_TRIGGERS = [f'directory_fts_{table}_{event}' for table in ('user', 'partner') for event in ('ins', 'upd', 'del')]
+
+
+def ensure_directory_index():
+    """Create and backfill the FTS5 directory index if this is SQLite and it is missing."""
+    if db.engine.dialect.name != 'sqlite':
+        current_app.extensions['directory_fts'] = False
+        return
+    with db.engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'directory_fts'"
+        )).first()
+        if not exists:
+            try:
+                for statement in _FTS_DDL:
+                    conn.execute(text(statement))
+            except OperationalError:
+                # SQLite built without FTS5
+                conn.rollback()
+                current_app.extensions['directory_fts'] = False
+                return
+    current_app.extensions['directory_fts'] = True
+
+
+def drop_directory_index():
+    """Remove the FTS5 index and its triggers (before dropping the tables they watch)."""
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            for name in _FTS_TRIGGERS:
+                conn.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+            conn.execute(text('DROP TABLE IF EXISTS directory_fts'))
+    current_app.extensions.pop('directory_fts', None)
+
+
+def _directory_index_available():
+    # Migration 0005 builds the index; look it up once per app instead of at startup
+    available = current_app.extensions.get('directory_fts')
+    if available is None:
+        available = db.engine.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'directory_fts'"
+        )).first() is not None
+        current_app.extensions['directory_fts'] = available
+    return available
+
+
+def _fts_query(term):
+    # Every word must match as a prefix; quotes keep FTS syntax out of user input
+    words = [w.replace('"', '') for w in term.split()]
+    return ' '.join(f'"{w}"*' for w in words if w)
+
+
+def _matching_user_ids(term):
+    """Subquery of user ids whose username, email or platform name matches ``term``."""
+    fts_query = _fts_query(term)
+    if fts_query and _directory_index_available():
+        return (text('SELECT rowid FROM directory_fts WHERE directory_fts MATCH :q')
+                .bindparams(q=fts_query).columns(rowid=db.Integer))
+    pattern = f'%{term.lower()}%'
+    return (
+        select(User.id)
+        .outerjoin(Partner, Partner.user_id == User.id)
+        .where(or_(
+            func.lower(User.username).like(pattern),
+            func.lower(User.email).like(pattern),
+            func.lower(Partner.platform_name).like(pattern),
+        ))
+    )
+
+
+def _page(query, model, after_id, page_size):
+    if after_id:
+        query = query.filter(model.id > after_id)
+    rows = query.order_by(model.id.asc()).limit(page_size + 1).all()
+    next_after = rows[page_size - 1].id if len(rows) > page_size else None
+    return rows[:page_size], next_after
+
+
+def search_users(term=None, role=None, after_id=None, page_size=PAGE_SIZE):
+    """One page of users (by id) matching ``term`` and ``role``, plus the next ``after_id``."""
+    query = User.query
+    if term and term.strip():
+        query = query.filter(User.id.in_(_matching_user_ids(term.strip())))
+    if role:
+        query = query.filter(User.role == role)
+    return _page(query, User, after_id, page_size)
+
+
+def search_partners(term=None, after_id=None, page_size=PAGE_SIZE):
+    """One page of partners (by id) matching ``term``, with their login user loaded."""
+    query = Partner.query.options(joinedload(Partner.user))
+    if term and term.strip():
+        query = query.filter(Partner.user_id.in_(_matching_user_ids(term.strip())))
+    return _page(query, Partner, after_id, page_size)
+
+
+def summary_counts():
+    """Headline numbers for the admin dashboard from three aggregate queries.
+
+    Orders are counted from ``order_rollup`` (live and archived alike), so the
+    cost does not grow with the order table.
+    """
+    users_by_role = dict(db.session.execute(select(User.role, func.count()).group_by(User.role)).all())
+    orders_by_status = dict(db.session.execute(
+        select(OrderRollup.status, func.sum(OrderRollup.orders)).group_by(OrderRollup.status)
+        .having(func.sum(OrderRollup.orders) > 0)).all())
+    return {
+        'users': sum(users_by_role.values()),
+        'users_by_role': users_by_role,
+        'partners': db.session.scalar(select(func.count()).select_from(Partner)),
+        'orders': sum(orders_by_status.values()),
+        'orders_by_status': orders_by_status,
+    }
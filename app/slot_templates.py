@@ -0,0 +1,141 @@
+"""Weekly slot templates: expand a pattern into TimeSlot rows and sync them in bulk.
+
+A template is days x time ranges x interval x capacity. ``plan_template``
+diffs it against the partner's current slots and ``apply_plan`` writes the
+whole diff in one transaction; slots that already have orders are never
+deleted.
+"""
+from sqlalchemy import delete, exists, insert, select, update
+from . import db
+from .clock import parse_clock, format_clock
+from .models import Order, OrderArchive, SlotBookingCounter, SlotHold, TimeSlot
+
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def parse_ranges(text):
+    """``[(start, end), ...]`` in minutes from lines like '9:00 AM - 11:00 AM'."""
+    ranges = []
+    for line in (text or '').replace(',', '\n').splitlines():
+        if not line.strip():
+            continue
+        start, sep, end = line.partition('-')
+        if not sep:
+            raise ValueError(f'Time range needs a start and an end: {line.strip()!r}')
+        start, end = parse_clock(start), parse_clock(end)
+        if end <= start:
+            raise ValueError(f'Time range ends before it starts: {line.strip()!r}')
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError('Add at least one time range')
+    ranges.sort()
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        if start < end:
+            raise ValueError('Time ranges must not overlap')
+    return ranges
+
+
+def expand_template(days, ranges, interval, capacity):
+    """Slot dicts for every ``interval``-minute block of every range on every day."""
+    if interval <= 0 or capacity <= 0:
+        raise ValueError('Interval and capacity must be positive')
+    slots = []
+    for day in DAYS:
+        if day not in days:
+            continue
+        for start, end in sorted(ranges):
+            t = start
+            while t + interval <= end:
+                slots.append({
+                    'day_of_week': day,
+                    'start_minute': t,
+                    'end_minute': t + interval,
+                    'start_time': format_clock(t),
+                    'end_time': format_clock(t + interval),
+                    'max_capacity': capacity,
+                })
+                t += interval
+    return slots
+
+
+def template_from_form(form):
+    """Expanded slots from the partner dashboard's template form; ValueError on bad input."""
+    days = form.getlist('days')
+    if not days or any(day not in DAYS for day in days):
+        raise ValueError('Pick at least one day')
+    try:
+        interval = int(form.get('interval', ''))
+        capacity = int(form.get('capacity', ''))
+    except ValueError:
+        raise ValueError('Interval and capacity must be whole numbers') from None
+    return expand_template(days, parse_ranges(form.get('ranges')), interval, capacity)
+
+
+def _key(slot):
+    return slot.day_of_week, slot.start_minute, slot.end_minute
+
+
+def _overlaps(slot, others):
+    return any(other.day_of_week == slot['day_of_week'] and other.start_minute is not None
+               and other.start_minute < slot['end_minute'] and other.end_minute > slot['start_minute']
+               for other in others)
+
+
+def plan_template(partner_id, desired, remove_missing=True):
+    """Diff ``desired`` slots against the partner's slots, without writing anything.
+
+    Returns a dict of lists: ``create`` (new slot dicts), ``update`` (existing
+    slots with their new capacity), ``unchanged``, ``delete`` (slots absent from
+    the template), ``preserved`` (absent but holding live or archived orders, so kept) and
+    ``conflicts`` (new slots skipped because they overlap a slot that stays).
+    """
+    existing = TimeSlot.query.filter_by(partner_id=partner_id).all()
+    booked_ids = set(db.session.scalars(
+        select(Order.time_slot_id).join(TimeSlot).where(TimeSlot.partner_id == partner_id)
+        .union(select(OrderArchive.time_slot_id).join(TimeSlot).where(TimeSlot.partner_id == partner_id))
+    ))
+    by_key = {_key(s): s for s in existing}
+
+    plan = {'create': [], 'update': [], 'unchanged': [], 'delete': [], 'preserved': [], 'conflicts': []}
+    wanted = set()
+    new_slots = []
+    for slot in desired:
+        key = (slot['day_of_week'], slot['start_minute'], slot['end_minute'])
+        wanted.add(key)
+        current = by_key.get(key)
+        if current is None:
+            new_slots.append(slot)
+        elif current.max_capacity != slot['max_capacity']:
+            plan['update'].append({'slot': current, 'max_capacity': slot['max_capacity']})
+        else:
+            plan['unchanged'].append(current)
+    for key, slot in by_key.items():
+        if key not in wanted and remove_missing:
+            plan['preserved' if slot.id in booked_ids else 'delete'].append(slot)
+    removed = {slot.id for slot in plan['delete']}
+    kept = [slot for slot in existing if slot.id not in removed]
+    for slot in new_slots:
+        plan['conflicts' if _overlaps(slot, kept) else 'create'].append(slot)
+    return plan
+
+
+def apply_plan(partner_id, plan):
+    """Write a ``plan_template`` diff in one transaction with bulk statements."""
+    if plan['create']:
+        db.session.execute(insert(TimeSlot), [dict(slot, partner_id=partner_id) for slot in plan['create']])
+    if plan['update']:
+        db.session.execute(update(TimeSlot), [
+            {'id': change['slot'].id, 'max_capacity': change['max_capacity']} for change in plan['update']
+        ])
+    if plan['delete']:
+        ids = [slot.id for slot in plan['delete']]
+        # Re-check for orders at write time: a booking may have landed since the preview
+        unbooked = select(TimeSlot.id).where(
+            TimeSlot.id.in_(ids), ~exists().where(Order.time_slot_id == TimeSlot.id),
+            ~exists().where(OrderArchive.time_slot_id == TimeSlot.id),
+        ).scalar_subquery()
+        db.session.execute(delete(SlotHold).where(SlotHold.time_slot_id.in_(unbooked)))
+        db.session.execute(delete(SlotBookingCounter).where(SlotBookingCounter.time_slot_id.in_(unbooked)))
+        db.session.execute(delete(TimeSlot).where(TimeSlot.id.in_(unbooked)))
+    db.session.commit()
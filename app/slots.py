@@ -0,0 +1,28 @@
+"""Time slot interval queries on minutes since midnight.
+
+Both helpers seek the (partner_id, day_of_week, start_minute, end_minute)
+index, so overlap checks and time-window filters stay index lookups.
+"""
+from .models import TimeSlot
+
+
+def find_overlap(partner_id, day_of_week, start_minute, end_minute, exclude_ids=()):
+    """The first of the partner's slots on that day overlapping [start, end), or None."""
+    query = TimeSlot.query.filter(
+        TimeSlot.partner_id == partner_id,
+        TimeSlot.day_of_week == day_of_week,
+        TimeSlot.start_minute < end_minute,
+        TimeSlot.end_minute > start_minute,
+    )
+    if exclude_ids:
+        query = query.filter(TimeSlot.id.notin_(exclude_ids))
+    return query.order_by(TimeSlot.start_minute).first()
+
+
+def within_window(query, from_minute=None, to_minute=None):
+    """Restrict a TimeSlot query to slots lying inside [from_minute, to_minute]."""
+    if from_minute is not None:
+        query = query.where(TimeSlot.start_minute >= from_minute)
+    if to_minute is not None:
+        query = query.where(TimeSlot.end_minute <= to_minute)
+    return query
@@ -0,0 +1,140 @@
+"""HTTP-level savings: conditional GETs, response compression, fingerprinted static URLs.
+
+``Validators`` lets a view answer 304 from a cheap version stamp before
+doing any real work. ``HttpOptimizations`` compresses large HTML/JSON/CSS/JS
+responses (brotli when the optional ``brotli`` package is installed, else
+gzip) and adds a content hash to every ``url_for('static', ...)`` URL so
+static files can be cached for a year.
+"""
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript',
+                      'text/javascript', 'image/svg+xml')
+
+# A year: fingerprinted URLs change whenever the file does
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+class Validators:
+    """ETag and Last-Modified for a GET whose body depends only on ``tag`` and the request URL.
+
+    Build it before doing any work; if ``fresh``, return ``not_modified()``
+    straight away, otherwise ``apply`` it to the full response.
+    """
+
+    def __init__(self, tag, changed_at):
+        key = f'{tag}|{datetime.now():%Y-%m-%d}|{request.full_path}'  # the date: URLs default to "today"
+        self.etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+        self.last_modified = datetime.fromtimestamp(int(changed_at), timezone.utc)
+        if request.if_none_match:
+            self.fresh = request.if_none_match.contains_weak(self.etag)
+        else:
+            self.fresh = request.if_modified_since is not None and request.if_modified_since >= self.last_modified
+
+    def apply(self, response):
+        response.set_etag(self.etag)
+        response.last_modified = self.last_modified
+        # Reusable only after revalidating, which is now a cheap 304
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    def not_modified(self):
+        return self.apply(current_app.response_class(status=304))
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+class HttpOptimizations:
+    """Flask extension: response compression and static file fingerprinting."""
+
+    def __init__(self, app=None):
+        self._hashes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)  # bytes; smaller bodies are not worth it
+        app.config.setdefault('COMPRESS_LEVEL', 6)  # gzip level
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        app.config.setdefault('STATIC_FINGERPRINT', True)
+        if app.config['STATIC_FINGERPRINT']:
+            app.url_defaults(self._fingerprint)
+        app.after_request(self._after_request)
+
+    def _file_hash(self, app, filename):
+        path = os.path.join(app.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = self._hashes[path] = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        return cached[1]
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = self._file_hash(current_app, values['filename'])
+            if digest:
+                values['v'] = digest
+
+    def _after_request(self, response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        if self._compressible(response):
+            self._compress(response)
+        return response
+
+    @staticmethod
+    def _compressible(response):
+        config = current_app.config
+        return (
+            config['COMPRESS_ENABLED']
+            and response.status_code == 200
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_TYPES
+            and (response.content_length or 0) >= config['COMPRESS_MIN_SIZE']
+        )
+
+    @staticmethod
+    def _compress(response):
+        response.vary.add('Accept-Encoding')
+        encoding = _negotiate()
+        if encoding is None:
+            return
+        body = response.get_data()
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            compressed = gzip.compress(body, compresslevel=current_app.config['COMPRESS_LEVEL'], mtime=0)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # A compressed body is a different representation; keep validators matching weakly
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
@@ -0,0 +1,187 @@
+"""Order placement, optionally through a group-commit writer.
+
+By default every booking claims its seat, inserts the order and commits in
+its own request. With BOOKING_GROUP_COMMIT on, requests hand their booking to
+one writer thread per process instead. The writer collects the bookings that
+arrive within BOOKING_GROUP_WINDOW seconds (up to BOOKING_GROUP_SIZE), runs
+their seat claims and inserts in a single transaction and tells each waiting
+request whether it got its seat. One commit, and one pass of cache
+invalidation per slot-date, then serves the whole group.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from flask import current_app
+from . import db
+from .availability import availability_changed
+from .booking import count_orders
+from .holds import claim_seat
+from .live import order_booked
+from .models import Order
+from .outbox import queue_confirmation
+
+
+def new_order(user, partner, slot, booking_date, fields, hold_token=None):
+    """Claim a seat and add the order to the session; None (nothing added) when the slot is full."""
+    if not claim_seat(user.id, slot.id, booking_date, hold_token):
+        return None
+    order = Order(user_id=user.id, partner_id=partner.id, time_slot_id=slot.id, order_platform=partner.platform_name,
+                  status='Booked', booking_date=booking_date, **fields)
+    db.session.add(order)
+    return order
+
+
+def _confirm(bookings):
+    """Flush the new orders, count them in the rollup and queue their confirmation emails.
+
+    ``bookings`` pairs jobs with their orders (None when the slot was full).
+    """
+    db.session.flush()
+    count_orders(Counter((order.partner_id, order.time_slot_id, order.booking_date, order.status)
+                         for _, order in bookings if order is not None))
+    for job, order in bookings:
+        if order is not None:
+            queue_confirmation(order, job.user, job.slot)
+
+
+def _announce(bookings):
+    """Cache invalidation and live events for committed bookings."""
+    for partner_id, day in {(order.partner_id, order.booking_date) for _, order in bookings if order is not None}:
+        availability_changed(partner_id, day)
+    for job, order in bookings:
+        if order is not None:
+            order_booked(order, job.slot)
+
+
+class _Job:
+    __slots__ = ('user', 'partner', 'slot', 'booking_date', 'fields', 'hold_token', 'future')
+
+    def __init__(self, user, partner, slot, booking_date, fields, hold_token):
+        self.user = user
+        self.partner = partner
+        self.slot = slot
+        self.booking_date = booking_date
+        self.fields = fields
+        self.hold_token = hold_token
+        self.future = Future()
+
+
+class GroupWriter:
+    """The writer thread of one process and the queue feeding it."""
+
+    def __init__(self, app, window, size):
+        self.app = app
+        self.window = window
+        self.size = size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.groups = 0
+        self.bookings = 0
+        self.largest = 0
+
+    def submit(self, job):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='booking-writer', daemon=True)
+                    self._thread.start()
+        self._queue.put(job)
+        return job.future
+
+    def _collect(self):
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(group) < self.size:
+            try:
+                group.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            group = self._collect()
+            try:
+                with self.app.app_context():
+                    self._write(group)
+            except Exception as exc:  # pragma: no cover - keep the writer alive
+                self.app.logger.exception('Booking writer failed')
+                for job in group:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+
+    def _commit(self, jobs):
+        bookings = [(job, new_order(job.user, job.partner, job.slot, job.booking_date, job.fields, job.hold_token))
+                    for job in jobs]
+        _confirm(bookings)
+        db.session.commit()
+        return bookings
+
+    def _write(self, group):
+        # Orders are announced after the commit; keep their loaded state instead of reloading each one
+        db.session().expire_on_commit = False
+        try:
+            bookings = self._commit(group)
+        except Exception:
+            db.session.rollback()
+            # One failing booking must not sink the group: retry them one by one
+            bookings = []
+            for job in group:
+                try:
+                    bookings += self._commit([job])
+                except Exception as exc:
+                    db.session.rollback()
+                    job.future.set_exception(exc)
+        self.groups += 1
+        self.bookings += len(group)
+        self.largest = max(self.largest, len(group))
+        for job, order in bookings:
+            job.future.set_result(order)
+        _announce(bookings)
+
+    def stats(self):
+        return {'groups': self.groups, 'bookings': self.bookings, 'largest': self.largest,
+                'queued': self._queue.qsize()}
+
+
+_writer_lock = threading.Lock()
+
+
+def group_writer():
+    """The app's writer, created on first use; None unless BOOKING_GROUP_COMMIT is on."""
+    app = current_app._get_current_object()
+    if not app.config['BOOKING_GROUP_COMMIT']:
+        return None
+    writer = app.extensions.get('booking_writer')
+    if writer is None:
+        with _writer_lock:
+            writer = app.extensions.get('booking_writer')
+            if writer is None:
+                writer = app.extensions['booking_writer'] = GroupWriter(
+                    app, app.config['BOOKING_GROUP_WINDOW'], app.config['BOOKING_GROUP_SIZE'])
+    return writer
+
+
+def book(user, partner, slot, booking_date, fields, hold_token=None):
+    """Place and commit one order; returns it, or None when the slot is full.
+
+    ``fields`` are the order's form columns (order_id_text, name, ...).
+    """
+    job = _Job(user, partner, slot, booking_date, fields, hold_token)
+    writer = group_writer()
+    if writer is not None:
+        # Hand the pooled connection back while waiting (the writer needs one); the user, partner
+        # and slot stay readable detached. Blocks until the writer has committed this booking's group.
+        db.session.close()
+        return writer.submit(job).result()
+    order = new_order(user, partner, slot, booking_date, fields, hold_token)
+    if order is None:
+        db.session.rollback()
+        return None
+    _confirm([(job, order)])
+    db.session.commit()
+    _announce([(job, order)])
+    return order
@@ -0,0 +1,141 @@
+"""Shared set-up for the booking benchmarks.
+
+A scratch app on the benchmark database, a bench partner with slots and
+signed-in students, and a barrier-started crowd of clients posting
+/order/new. Each benchmark passes its own config overrides, slot count and
+bookings per client.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Partner, TimeSlot  # noqa: E402
+
+# Admission control turns most of a benchmark's burst away; off unless a run asks for it
+NO_ADMISSION = {'RATE_LIMIT_ENABLED': False, 'BOOKING_WORKERS': 0}
+
+
+def scratch_url(prefix):
+    """URL of a fresh SQLite file in a temporary directory."""
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix=prefix), 'bench.db')}"
+
+
+def build_app(database_url, **config):
+    """App on ``database_url`` with every app table dropped and recreated; ``config`` overrides."""
+    engine_options = {}
+    if database_url.startswith('sqlite'):
+        # Writers queue on SQLite's single write lock; give them time to get through
+        engine_options['connect_args'] = {'timeout': 60, 'check_same_thread': False}
+    else:
+        engine_options['pool_size'] = 20
+        engine_options['max_overflow'] = 100
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+        **config,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed(app, students, slots, capacity):
+    """A partner with ``slots`` half-hour slots of ``capacity`` seats tomorrow, and ``students`` students.
+
+    Returns ``(partner_id, slot_ids, booking_date, student_ids)``.
+    """
+    with app.app_context():
+        owner = User(username='bench_partner', password_hash='-', role='partner')
+        db.session.add(owner)
+        db.session.flush()
+        partner = Partner(platform_name='Bench', user_id=owner.id)
+        db.session.add(partner)
+        db.session.flush()
+        booking_date = date.today() + timedelta(days=1)
+        rows = [TimeSlot(partner_id=partner.id, day_of_week=booking_date.strftime('%A'),
+                         start_minute=9 * 60 + 30 * i, end_minute=9 * 60 + 30 * (i + 1), max_capacity=capacity)
+                for i in range(slots)]
+        db.session.add_all(rows)
+        users = [User(username=f'student{i}', email=f'student{i}@example.com', password_hash='-', role='user')
+                 for i in range(students)]
+        db.session.add_all(users)
+        db.session.commit()
+        return partner.id, [slot.id for slot in rows], booking_date, [user.id for user in users]
+
+
+def signed_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+
+def post_booking(client, partner_id, slot_id, booking_date, user_id, ref):
+    """POST /order/new; returns 'booked', 'full', 'busy' (turned away by admission control) or 'error'."""
+    try:
+        resp = client.post('/order/new', data={
+            'partner_id': partner_id,
+            'time_slot_id': slot_id,
+            'booking_date': booking_date.isoformat(),
+            'order_id_text': ref,
+            'college_reg_no': f'REG{user_id}',
+            'name': f'Student {user_id}',
+            'phone': '9999999999',
+            'type': 'Pickup',
+        })
+    except Exception:
+        return 'error'
+    if resp.status_code in (429, 503):
+        return 'busy'
+    if resp.status_code != 302:
+        return 'error'
+    return 'booked' if resp.headers.get('Location', '').endswith('/user_dashboard') else 'full'
+
+
+def book_concurrently(app, partner_id, slot_ids, booking_date, student_ids, bookings=1):
+    """Every student books ``bookings`` times in turn, all starting together, spread over ``slot_ids``.
+
+    Returns ``(outcomes, latencies, wall)``: counts per ``post_booking`` outcome,
+    sorted per-request latencies and the wall time, in seconds.
+    """
+    barrier = threading.Barrier(len(student_ids))
+    outcomes = {'booked': 0, 'full': 0, 'busy': 0, 'error': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n, user_id):
+        client = signed_in_client(app, user_id)
+        barrier.wait()
+        for i in range(bookings):
+            started = time.perf_counter()
+            outcome = post_booking(client, partner_id, slot_ids[(n + i) % len(slot_ids)], booking_date, user_id,
+                                   f'BENCH-{user_id}-{i}')
+            elapsed = time.perf_counter() - started
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(n, user_id)) for n, user_id in enumerate(student_ids)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+    latencies.sort()
+    return outcomes, latencies, wall
+
+
+def percentile(latencies, share):
+    """``share`` (0-1) percentile of sorted ``latencies``; 0 when empty."""
+    return latencies[max(int(len(latencies) * share) - 1, 0)] if latencies else 0
@@ -0,0 +1,119 @@
+"""Latency of GET /api/get_slots as the order table grows.
+
+Grows a scratch database from 1k to 1M orders (spread over a year of dates and
+every slot) and times the availability endpoint at each size.
+
+    python benchmarks/availability_scaling.py
+    python benchmarks/availability_scaling.py --sizes 1000,10000,100000 --requests 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Partner, TimeSlot, Order  # noqa: E402
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def build_app(database_url):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'TESTING': True})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench_student', password_hash='-', role='user')
+        owner = User(username='bench_partner', password_hash='-', role='partner')
+        db.session.add_all([user, owner])
+        db.session.flush()
+        partner = Partner(platform_name='Bench', user_id=owner.id)
+        db.session.add(partner)
+        db.session.flush()
+        for day in DAYS:
+            for hour in range(9, 19):
+                db.session.add(TimeSlot(partner_id=partner.id, day_of_week=day, start_minute=hour * 60,
+                                        end_minute=hour * 60 + 30, max_capacity=10_000))
+        db.session.commit()
+        return app, user.id, partner.id
+
+
+def grow(app, user_id, partner_id, start, stop, rng):
+    with app.app_context():
+        slots_by_day = {}
+        for slot in TimeSlot.query.filter_by(partner_id=partner_id):
+            slots_by_day.setdefault(slot.day_of_week, []).append(slot.id)
+        first = date.today()
+        now = datetime.utcnow()
+        batch = []
+        for n in range(start, stop):
+            booking_date = first + timedelta(days=rng.randrange(365))
+            batch.append({
+                'user_id': user_id, 'partner_id': partner_id,
+                'time_slot_id': rng.choice(slots_by_day[booking_date.strftime('%A')]),
+                'order_platform': 'Bench', 'order_id_text': f'B{n}', 'college_reg_no': 'REG',
+                'name': 'Bench', 'phone': '0', 'type': 'Pickup', 'status': 'Booked',
+                'booking_date': booking_date, 'created_at': now,
+            })
+            if len(batch) == 50_000:
+                db.session.execute(insert(Order), batch)
+                batch.clear()
+        if batch:
+            db.session.execute(insert(Order), batch)
+        db.session.commit()
+
+
+def measure(app, user_id, partner_id, requests, rng):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    statements = []
+
+    def count_statement(*_):
+        statements.append(1)
+
+    with app.app_context():
+        engine = db.engine
+    # Requests must run outside an outer app context so per-request state (g) is not shared
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    timings = []
+    for _ in range(requests):
+        day = (date.today() + timedelta(days=rng.randrange(365))).isoformat()
+        started = time.perf_counter()
+        resp = client.get(f'/api/get_slots/{partner_id}?date={day}')
+        timings.append(time.perf_counter() - started)
+        assert resp.status_code == 200, resp.status_code
+    event.remove(engine, 'before_cursor_execute', count_statement)
+    return timings, len(statements) / requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a scratch SQLite file')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='availability_'), 'bench.db')}"
+    rng = random.Random(42)
+    app, user_id, partner_id = build_app(database_url)
+
+    print(f'{"orders":>10} {"p50 ms":>8} {"p95 ms":>8} {"queries/req":>12}')
+    current = 0
+    for size in (int(s) for s in args.sizes.split(',')):
+        grow(app, user_id, partner_id, current, size, rng)
+        current = size
+        timings, queries = measure(app, user_id, partner_id, args.requests, rng)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f'{size:>10} {statistics.median(timings) * 1000:>8.2f} {p95 * 1000:>8.2f} {queries:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Query-count guard for the dashboards.
+
+Renders the student and partner dashboards (and the partner's analytics page,
+which must read only the order rollup) with a handful of orders and again
+with hundreds, and fails (exit status 1) if either render issues more SQL
+statements than its budget or if the count grows with the number of orders --
+the signature of an N+1 relationship load creeping back into a template.
+
+    python benchmarks/dashboard_queries.py
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, insert  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.booking import rebuild_rollups  # noqa: E402
+from app.models import User, Partner, TimeSlot, Order  # noqa: E402
+
+# Statements allowed per render, including the user_loader lookup
+BUDGETS = {
+    '/user_dashboard': 2,
+    '/partner_dashboard': 4,
+    '/partner/analytics': 7,
+}
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect the SQL statements executed on ``engine`` inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def build_app():
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dashboard_queries_'), 'bench.db')}"
+    # Identity cache off so every render pays for the user_loader lookup
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'TESTING': True, 'IDENTITY_CACHE_TTL': 0})
+    with app.app_context():
+        db.create_all()
+        student = User(username='student', password_hash='-', role='user')
+        owner = User(username='partner', password_hash='-', role='partner')
+        db.session.add_all([student, owner])
+        db.session.flush()
+        partner = Partner(platform_name='Bench', user_id=owner.id)
+        db.session.add(partner)
+        db.session.flush()
+        for day in ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'):
+            db.session.add(TimeSlot(partner_id=partner.id, day_of_week=day, start_minute=9 * 60,
+                                    end_minute=9 * 60 + 30, max_capacity=1000))
+        db.session.commit()
+        return app, {'/user_dashboard': student.id, '/partner_dashboard': owner.id,
+                     '/partner/analytics': owner.id}, partner.id
+
+
+def add_orders(app, user_id, partner_id, count):
+    with app.app_context():
+        slot_ids = [s.id for s in TimeSlot.query.filter_by(partner_id=partner_id)]
+        today = date.today()
+        db.session.execute(insert(Order), [{
+            'user_id': user_id, 'partner_id': partner_id, 'time_slot_id': slot_ids[n % len(slot_ids)],
+            'order_platform': 'Bench', 'order_id_text': f'B{n}', 'college_reg_no': f'REG{n}',
+            'name': f'Student {n}', 'phone': '0', 'type': 'Pickup', 'status': 'Booked',
+            'booking_date': today + timedelta(days=n % 7), 'created_at': datetime.utcnow(),
+        } for n in range(count)])
+        rebuild_rollups()
+        db.session.commit()
+        return db.engine
+
+
+def render_counts(app, engine, users):
+    counts = {}
+    for path, user_id in users.items():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+        with count_queries(engine) as statements:
+            resp = client.get(path)
+        assert resp.status_code == 200, (path, resp.status_code)
+        counts[path] = len(statements)
+    return counts
+
+
+def main():
+    app, users, partner_id = build_app()
+    engine = add_orders(app, users['/user_dashboard'], partner_id, 5)
+    small = render_counts(app, engine, users)
+    add_orders(app, users['/user_dashboard'], partner_id, 500)
+    large = render_counts(app, engine, users)
+
+    failed = False
+    for path, budget in BUDGETS.items():
+        ok = large[path] <= budget and large[path] == small[path]
+        failed |= not ok
+        print(f'{"ok  " if ok else "FAIL"} {path:<20} 5 orders: {small[path]} queries  '
+              f'505 orders: {large[path]} queries  budget: {budget}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
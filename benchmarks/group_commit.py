@@ -0,0 +1,63 @@
+"""Booking throughput with and without group commit.
+
+Many concurrent clients (threads, each with its own Flask test client and
+signed-in student) POST /order/new against a handful of slots, first with the
+per-request commit path and then with BOOKING_GROUP_COMMIT on, each on a fresh
+scratch database. Reports bookings per second, latency, the writer's average
+group size and checks that no slot was overbooked.
+
+    python benchmarks/group_commit.py
+    python benchmarks/group_commit.py --writers 64 --bookings 20 --slots 8 --capacity 200
+    python benchmarks/group_commit.py --database-url postgresql://user:pw@localhost/bench
+
+The target database is wiped of app tables before each run; never point it at real data.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, select  # noqa: E402
+from app import db  # noqa: E402
+from app.models import Order  # noqa: E402
+from _harness import NO_ADMISSION, book_concurrently, build_app, percentile, scratch_url, seed  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a scratch SQLite file per run')
+    parser.add_argument('--writers', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--bookings', type=int, default=10, help='bookings each client makes in turn')
+    parser.add_argument('--slots', type=int, default=8)
+    parser.add_argument('--capacity', type=int, default=30, help='seats per slot')
+    parser.add_argument('--window', type=float, default=0.002, help='BOOKING_GROUP_WINDOW in seconds')
+    args = parser.parse_args(argv)
+
+    print(f'writers {args.writers} x {args.bookings} bookings  slots {args.slots} x {args.capacity} seats')
+    print(f'{"mode":<14}{"booked":>8}{"full":>6}{"errors":>8}{"bookings/s":>12}{"p50 ms":>9}{"p95 ms":>9}{"group":>7}')
+    failed = False
+    for mode, group_commit in (('per-request', False), ('group commit', True)):
+        app = build_app(args.database_url or scratch_url('group_commit_'), METRICS_ENABLED=False,
+                        BOOKING_GROUP_COMMIT=group_commit, BOOKING_GROUP_WINDOW=args.window, **NO_ADMISSION)
+        partner_id, slot_ids, booking_date, student_ids = seed(app, args.writers, args.slots, args.capacity)
+        outcomes, latencies, wall = book_concurrently(app, partner_id, slot_ids, booking_date, student_ids,
+                                                      args.bookings)
+        with app.app_context():
+            stored = dict(db.session.execute(
+                select(Order.time_slot_id, func.count(Order.id)).where(Order.booking_date == booking_date)
+                .group_by(Order.time_slot_id)).all())
+            writer = app.extensions.get('booking_writer')
+            stats = writer.stats() if writer is not None else None
+
+        overbooked = sum(max(0, n - args.capacity) for n in stored.values())
+        failed = failed or overbooked or sum(stored.values()) != outcomes['booked']
+        group = f'{stats["bookings"] / stats["groups"]:.1f}' if stats and stats['groups'] else '-'
+        print(f'{mode:<14}{outcomes["booked"]:>8}{outcomes["full"]:>6}{outcomes["error"]:>8}'
+              f'{outcomes["booked"] / wall:>12.1f}{percentile(latencies, 0.5) * 1000:>9.1f}'
+              f'{percentile(latencies, 0.95) * 1000:>9.1f}{group:>7}   overbooked {overbooked}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
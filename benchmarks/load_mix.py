@@ -0,0 +1,296 @@
+"""Mixed-traffic load test for the booking and availability hot paths.
+
+Seeds a scratch database at a realistic scale (app.datagen), then has many concurrent
+clients (threads, each with its own Flask test client and signed-in student)
+replay a weighted mix of availability lookups, calendar fetches, bookings
+racing for a few hot slots, dashboard renders and sign-ins. Reports p50/p95/p99
+latency, throughput and SQL statements per request for each kind of request,
+plus the number of seats overbooked, and writes everything to JSON so runs on
+different commits can be compared.
+
+    python benchmarks/load_mix.py
+    python benchmarks/load_mix.py --clients 32 --duration 30 --orders 200000
+    python benchmarks/load_mix.py --compare benchmarks/results/load_mix-<commit>.json
+    python benchmarks/load_mix.py --database-url postgresql://user:pw@localhost/bench
+
+The target database is wiped of app tables before the run; never point it at real data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, func, select, update  # noqa: E402
+from app import db  # noqa: E402
+from app.booking import ACTIVE_STATUSES  # noqa: E402
+from app.datagen import generate  # noqa: E402
+from app.models import User, Partner, TimeSlot, Order  # noqa: E402
+from _harness import NO_ADMISSION, build_app, post_booking, scratch_url, signed_in_client  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+PASSWORD = 'Bench@1234'
+
+# Relative weight of each request kind in the replayed traffic
+DEFAULT_MIX = 'availability=50,calendar=10,booking=20,dashboard=15,signin=5'
+
+# Bookings all target this many slot-dates, each with HOT_CAPACITY seats
+HOT_SLOTS = 4
+HOT_CAPACITY = 20
+
+
+def seed(app, partners, students, orders, seed_value):
+    """Generate the scenario (see app.datagen); returns ids the traffic generator needs."""
+    with app.app_context():
+        generate(partners, students, orders, seed=seed_value, prefix='load', password=PASSWORD)
+        partner_ids = list(db.session.scalars(select(Partner.id).order_by(Partner.id)))
+        student_ids = list(db.session.scalars(select(User.id).where(User.role == 'user').order_by(User.id)))
+
+        # Bookings race for a few slot-dates beyond the generated orders, with little capacity
+        hot_date = date.today() + timedelta(days=30)
+        hot = []
+        for partner_id in partner_ids[:HOT_SLOTS]:
+            slot_id = db.session.scalar(
+                select(TimeSlot.id).where(TimeSlot.partner_id == partner_id,
+                                          TimeSlot.day_of_week == hot_date.strftime('%A'))
+                .order_by(TimeSlot.start_minute).limit(1)
+            )
+            db.session.execute(update(TimeSlot).where(TimeSlot.id == slot_id).values(max_capacity=HOT_CAPACITY))
+            hot.append((partner_id, slot_id))
+        db.session.commit()
+        return {'partners': partner_ids, 'students': student_ids, 'hot': hot, 'hot_date': hot_date}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight)
+    unknown = set(mix) - set(REQUESTS)
+    if unknown:
+        raise SystemExit(f'Unknown request kinds in --mix: {", ".join(sorted(unknown))}')
+    return mix
+
+
+def req_availability(ctx, client, rng):
+    day = date.today() + timedelta(days=rng.randrange(28))
+    resp = client.get(f'/api/get_slots/{rng.choice(ctx["partners"])}?date={day.isoformat()}')
+    return resp.status_code == 200
+
+
+def req_calendar(ctx, client, rng):
+    resp = client.get(f'/api/availability/{rng.choice(ctx["partners"])}?from={date.today().isoformat()}')
+    return resp.status_code == 200
+
+
+def req_booking(ctx, client, rng):
+    partner_id, slot_id = rng.choice(ctx['hot'])
+    outcome = post_booking(client, partner_id, slot_id, ctx['hot_date'], 'LOAD', f'LOAD{rng.randrange(10 ** 9)}')
+    # Both "booked" and "slot full" are successful outcomes
+    return outcome in ('booked', 'full')
+
+
+def req_dashboard(ctx, client, rng):
+    return client.get('/user_dashboard').status_code == 200
+
+
+def req_signin(ctx, client, rng):
+    anonymous = ctx['app'].test_client()
+    n = rng.randrange(len(ctx['students']))
+    resp = anonymous.post('/signin', data={'email': f'load_student{n}', 'password': PASSWORD})
+    return resp.status_code == 302 and resp.headers.get('Location', '').endswith('/dashboard')
+
+
+REQUESTS = {
+    'availability': req_availability,
+    'calendar': req_calendar,
+    'booking': req_booking,
+    'dashboard': req_dashboard,
+    'signin': req_signin,
+}
+
+
+def replay(app, ctx, clients, duration, mix, seed):
+    """Run the traffic mix from ``clients`` threads for ``duration`` seconds."""
+    with app.app_context():
+        engine = db.engine
+    local = threading.local()
+
+    def count_statement(*_):
+        if getattr(local, 'statements', None) is not None:
+            local.statements += 1
+
+    samples = {kind: [] for kind in mix}
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+    kinds, weights = list(mix), list(mix.values())
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = signed_in_client(app, rng.choice(ctx['students']))
+        mine = []
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            local.statements = 0
+            started = time.perf_counter()
+            try:
+                ok = REQUESTS[kind](ctx, client, rng)
+            except Exception:
+                ok = False
+            mine.append((kind, time.perf_counter() - started, local.statements, ok))
+            local.statements = None
+        with lock:
+            for kind, elapsed, statements, ok in mine:
+                samples[kind].append((elapsed, statements, ok))
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+    event.remove(engine, 'before_cursor_execute', count_statement)
+    return samples, wall
+
+
+def overbooked_seats(app):
+    """Seats booked beyond capacity, summed over every slot-date."""
+    with app.app_context():
+        booked = (
+            select(Order.time_slot_id, Order.booking_date, func.count(Order.id).label('booked'))
+            .where(Order.status.in_(ACTIVE_STATUSES))
+            .group_by(Order.time_slot_id, Order.booking_date)
+            .subquery()
+        )
+        excess = db.session.scalar(
+            select(func.coalesce(func.sum(booked.c.booked - TimeSlot.max_capacity), 0))
+            .select_from(booked)
+            .join(TimeSlot, TimeSlot.id == booked.c.time_slot_id)
+            .where(booked.c.booked > TimeSlot.max_capacity)
+        )
+        return int(excess)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def summarize(samples, wall):
+    report = {}
+    for kind, rows in samples.items():
+        latencies = sorted(r[0] for r in rows)
+        report[kind] = {
+            'requests': len(rows),
+            'errors': sum(1 for r in rows if not r[2]),
+            'throughput_rps': round(len(rows) / wall, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'queries_per_request': round(sum(r[1] for r in rows) / len(rows), 2) if rows else 0,
+        }
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_report(result, baseline=None):
+    base = (baseline or {}).get('requests', {})
+    print(f'{"request":<14}{"count":>8}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"q/req":>7}'
+          + ('  p95 vs baseline' if base else ''))
+    for kind, row in result['requests'].items():
+        line = (f'{kind:<14}{row["requests"]:>8}{row["errors"]:>8}{row["throughput_rps"]:>9}'
+                f'{row["p50_ms"]:>9}{row["p95_ms"]:>9}{row["p99_ms"]:>9}{row["queries_per_request"]:>7}')
+        if kind in base and base[kind]['p95_ms']:
+            line += f'  {(row["p95_ms"] / base[kind]["p95_ms"] - 1) * 100:+.1f}%'
+        print(line)
+    totals = result['totals']
+    print(f'total         {totals["requests"]} requests in {totals["wall_s"]} s '
+          f'({totals["throughput_rps"]} req/s), overbooked seats {totals["overbooked_seats"]}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a scratch SQLite file')
+    parser.add_argument('--partners', type=int, default=20)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=15, help='seconds of traffic')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'request weights (default {DEFAULT_MIX})')
+    parser.add_argument('--hash-method', default='scrypt:32768:8:1', help='PASSWORD_HASH_METHOD for seeded users')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='results file (default benchmarks/results/load_mix-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare p95 latencies against')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    if args.partners < HOT_SLOTS:
+        parser.error(f'--partners must be at least {HOT_SLOTS}')
+    database_url = args.database_url or scratch_url('load_mix_')
+
+    # Measures the application itself; admission control would turn most of the load away
+    app = build_app(database_url, PASSWORD_HASH_METHOD=args.hash_method, **NO_ADMISSION)
+    started = time.perf_counter()
+    ctx = seed(app, args.partners, args.students, args.orders, args.seed)
+    ctx['app'] = app
+    seeded_in = time.perf_counter() - started
+
+    samples, wall = replay(app, ctx, args.clients, args.duration, mix, args.seed)
+    report = summarize(samples, wall)
+    total = sum(row['requests'] for row in report.values())
+    commit = git_commit()
+    result = {
+        'benchmark': 'load_mix',
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': database_url.split('://', 1)[0],
+        'params': {k: v for k, v in vars(args).items() if k not in ('database_url', 'output', 'compare')},
+        'seed_seconds': round(seeded_in, 2),
+        'requests': report,
+        'totals': {
+            'requests': total,
+            'errors': sum(row['errors'] for row in report.values()),
+            'wall_s': round(wall, 2),
+            'throughput_rps': round(total / wall, 1),
+            'overbooked_seats': overbooked_seats(app),
+        },
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print(f'baseline      {baseline.get("commit")} ({baseline.get("timestamp")})')
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'load_mix-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as fh:
+        json.dump(result, fh, indent=2)
+    print(f'results       {output}')
+    return 1 if result['totals']['overbooked_seats'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Contention benchmark for slot reservations.
+
+Fires many concurrent POST /order/new requests at one slot and checks that the
+number of stored orders never exceeds the slot's capacity.
+
+    python benchmarks/slot_contention.py                       # scratch SQLite file
+    python benchmarks/slot_contention.py --writers 200 --capacity 15
+    python benchmarks/slot_contention.py --admission          # with rate limits and the booking queue
+    python benchmarks/slot_contention.py --database-url postgresql://user:pw@localhost/bench
+
+The target database is wiped of app tables before the run; never point it at real data.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import Order  # noqa: E402
+from _harness import NO_ADMISSION, book_concurrently, build_app, percentile, scratch_url, seed  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a scratch SQLite file')
+    parser.add_argument('--writers', type=int, default=100)
+    parser.add_argument('--capacity', type=int, default=15)
+    parser.add_argument('--admission', action='store_true', help='keep rate limits and the booking queue on')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or scratch_url('slot_contention_')
+    # Off by default so the database's own contention handling is what gets measured
+    app = build_app(database_url, **({} if args.admission else NO_ADMISSION))
+    partner_id, slot_ids, booking_date, student_ids = seed(app, args.writers, 1, args.capacity)
+    outcomes, latencies, wall = book_concurrently(app, partner_id, slot_ids, booking_date, student_ids)
+    with app.app_context():
+        stored = Order.query.filter_by(time_slot_id=slot_ids[0], booking_date=booking_date).count()
+
+    overbooked = max(0, stored - args.capacity)
+    print(f'database      {database_url}')
+    print(f'writers       {args.writers}  capacity {args.capacity}')
+    print(f'booked        {outcomes["booked"]}  full {outcomes["full"]}  busy {outcomes["busy"]}  errors {outcomes["error"]}')
+    print(f'stored orders {stored}  overbooked {overbooked}')
+    print(f'wall time     {wall * 1000:.1f} ms  p95 latency {percentile(latencies, 0.95) * 1000:.1f} ms')
+    return 1 if overbooked or stored != outcomes['booked'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Apply pending schema migrations (run on every deploy, before starting the app).
+
+    python migrate.py                  # apply everything pending
+    python migrate.py --status         # list migrations and when they were applied
+    python migrate.py --to 0003        # stop after version 0003
+    python migrate.py --batch-size 5000
+
+Backfills commit per batch and resume where they stopped, so an interrupted
+run can simply be started again.
+"""
+import argparse
+import sys
+import time
+from app import create_app
+from app.migrations import migrate, status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', action='store_true', help='show applied and pending migrations')
+    parser.add_argument('--to', metavar='VERSION', help='apply migrations up to and including VERSION')
+    parser.add_argument('--batch-size', type=int, help='rows per backfill batch (default MIGRATION_BATCH_SIZE)')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.status:
+            for m, applied_at in status():
+                print(f'{m.version}  {applied_at:%Y-%m-%d %H:%M}  {m.name}' if applied_at
+                      else f'{m.version}  pending           {m.name}')
+            return 0
+        started = time.perf_counter()
+        applied = migrate(target=args.to, batch_size=args.batch_size)
+    if applied:
+        print(f'✓ Applied {len(applied)} migration(s) in {time.perf_counter() - started:.1f}s')
+    else:
+        print('✓ Database is up to date')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Move finished orders out of the live order table into order_archive.
+
+    python scripts/archive_orders.py                   # older than ORDER_ARCHIVE_DAYS
+    python scripts/archive_orders.py --days 30 --batch-size 5000
+    python scripts/archive_orders.py --limit 100000    # cap one run, e.g. from a nightly cron
+
+Safe to interrupt and re-run: every batch is copied and deleted in its own
+transaction.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.archive import archive_cutoff, archive_orders, reused_ids  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, help='archive orders booked more than DAYS ago (default ORDER_ARCHIVE_DAYS)')
+    parser.add_argument('--batch-size', type=int, help='rows per transaction (default ORDER_ARCHIVE_BATCH_SIZE)')
+    parser.add_argument('--limit', type=int, help='stop after this many orders')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        before = date.today() - timedelta(days=max(args.days, 1)) if args.days else archive_cutoff()
+        moved = archive_orders(before, batch_size=args.batch_size, limit=args.limit,
+                               progress=lambda message: print(f'  {message}', flush=True))
+        clashes = reused_ids()
+    print(f'✓ Archived {moved} orders booked before {before} in {time.perf_counter() - started:.1f}s')
+    if clashes:
+        print(f'! {clashes} archived orders have ids at or above the newest live order; '
+              'new bookings may reuse their ids')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Outbox mail worker: queues slot reminders and sends every due message.
+
+    python scripts/mail_worker.py              # poll every 30 seconds
+    python scripts/mail_worker.py --once       # one pass, e.g. from cron
+    python scripts/mail_worker.py --workers 4 --batch-size 100
+
+SMTP settings come from the MAIL_* environment variables read by create_app.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.outbox import drain, schedule_reminders  # noqa: E402
+
+
+def run_once(app, workers, batch_size):
+    with app.app_context():
+        queued = schedule_reminders()
+    sent, failed = drain(app, workers=workers, batch_size=batch_size)
+    if queued or sent or failed:
+        print(f'reminders checked {queued}  sent {sent}  failed {failed}', flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='run a single pass and exit')
+    parser.add_argument('--interval', type=float, default=30, help='seconds between passes')
+    parser.add_argument('--workers', type=int, help='defaults to MAIL_WORKERS')
+    parser.add_argument('--batch-size', type=int, help='defaults to MAIL_BATCH_SIZE')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    while True:
+        run_once(app, args.workers, args.batch_size)
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
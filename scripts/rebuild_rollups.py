@@ -0,0 +1,41 @@
+"""Recompute order_rollup from live and archived orders.
+
+    python scripts/rebuild_rollups.py                      # every date
+    python scripts/rebuild_rollups.py --since 2025-01-01   # only dates from then on
+
+Bookings and status changes keep the rollup current on their own; run this
+after bulk imports, manual edits of the order tables, or to repair drift.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, select  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.booking import rebuild_rollups  # noqa: E402
+from app.models import OrderRollup  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--since', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help='only rebuild booking dates from this day on (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        rebuild_rollups(since=args.since)
+        db.session.commit()
+        rows = db.session.scalar(select(func.count()).select_from(OrderRollup))
+    scope = f'dates from {args.since}' if args.since else 'all dates'
+    print(f'✓ Rebuilt order rollup for {scope} ({rows} rows) in {time.perf_counter() - started:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,13 @@
 from werkzeug.security import generate_password_hash
 from app import create_app, db
+from app.migrations import migrate
 from app.models import User, Partner, TimeSlot
+from app.slot_templates import DAYS, expand_template, parse_ranges, plan_template, apply_plan
 
 app = create_app()
 
 with app.app_context():
-    db.create_all()
+    migrate()
 
     def ensure_user(username, password, role, email=None):
         u = User.query.filter_by(username=username).first()
@@ -17,7 +19,7 @@ with app.app_context():
                 role=role
             )
             db.session.add(u)
-            db.session.commit()
+            db.session.flush()
         return u
 
     # Create admin
@@ -33,7 +35,7 @@ with app.app_context():
             user_id=amazon_user.id
         )
         db.session.add(amazon_partner)
-        db.session.commit()
+        db.session.flush()
     
     # Create Flipkart partner
     flipkart_user = ensure_user('flipkart', 'Flipkart@123', 'partner', 'flipkart@delivery.com')
@@ -45,56 +47,24 @@ with app.app_context():
             user_id=flipkart_user.id
         )
         db.session.add(flipkart_partner)
-        db.session.commit()
+        db.session.flush()
     
-    # Define time slots
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    # Time slots: 9-11 AM (30-min intervals), 12-2 PM (30-min intervals), 3-4 PM (30-min intervals)
-    time_slots = [
-        ('9:00 AM', '9:30 AM'),
-        ('9:30 AM', '10:00 AM'),
-        ('10:00 AM', '10:30 AM'),
-        ('10:30 AM', '11:00 AM'),
-        ('12:00 PM', '12:30 PM'),
-        ('12:30 PM', '1:00 PM'),
-        ('1:00 PM', '1:30 PM'),
-        ('1:30 PM', '2:00 PM'),
-        ('3:00 PM', '3:30 PM'),
-        ('3:30 PM', '4:00 PM'),
-    ]
-    
-    # Add time slots for Amazon
-    existing_amazon_slots = TimeSlot.query.filter_by(partner_id=amazon_partner.id).count()
-    if existing_amazon_slots == 0:
-        for day in days:
-            for start, end in time_slots:
-                slot = TimeSlot(
-                    partner_id=amazon_partner.id,
-                    day_of_week=day,
-                    start_time=start,
-                    end_time=end,
-                    max_capacity=15
-                )
-                db.session.add(slot)
-        db.session.commit()
-        print(f'Added {len(days) * len(time_slots)} time slots for Amazon')
-    
-    # Add time slots for Flipkart
-    existing_flipkart_slots = TimeSlot.query.filter_by(partner_id=flipkart_partner.id).count()
-    if existing_flipkart_slots == 0:
-        for day in days:
-            for start, end in time_slots:
-                slot = TimeSlot(
-                    partner_id=flipkart_partner.id,
-                    day_of_week=day,
-                    start_time=start,
-                    end_time=end,
-                    max_capacity=15
-                )
-                db.session.add(slot)
-        db.session.commit()
-        print(f'Added {len(days) * len(time_slots)} time slots for Flipkart')
+    db.session.commit()
+
+    # Weekly template: all days, 9-11 AM, 12-2 PM, 3-4 PM in 30-min slots of 15
+    template = expand_template(
+        DAYS,
+        parse_ranges('9:00 AM - 11:00 AM\n12:00 PM - 2:00 PM\n3:00 PM - 4:00 PM'),
+        interval=30,
+        capacity=15,
+    )
+
+    # Add time slots for partners that have none yet (one bulk insert each)
+    for partner in (amazon_partner, flipkart_partner):
+        if TimeSlot.query.filter_by(partner_id=partner.id).count() == 0:
+            plan = plan_template(partner.id, template)
+            apply_plan(partner.id, plan)
+            print(f"Added {len(plan['create'])} time slots for {partner.platform_name}")
     
     print('\n=== SEEDING COMPLETE ===')
     print('\nPartner Credentials:')
@@ -103,3 +73,4 @@ with app.app_context():
     print('\nAdmin Credentials:')
     print('  Username: admin | Password: Admin@123')
     print('\nTime Slots: All days (Mon-Sun), 9-11 AM, 12-2 PM, 3-4 PM (30-min intervals)')
+    print('\nFor production-sized test data use scripts/generate_data.py')
@@ -0,0 +1,42 @@
+"""Hold sweeper: gives the seats of expired slot holds back.
+
+    python scripts/sweep_holds.py              # sweep every 5 seconds
+    python scripts/sweep_holds.py --once       # one pass, e.g. from cron
+
+Holds last HOLD_SECONDS (default 300); see app/holds.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.holds import sweep_expired_holds  # noqa: E402
+
+
+def run_once(app, batch_size):
+    with app.app_context():
+        released = sweep_expired_holds(batch_size=batch_size)
+    if released:
+        print(f'expired holds released {released}', flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='run a single pass and exit')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between passes')
+    parser.add_argument('--batch-size', type=int, default=1000, help='holds released per transaction')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    while True:
+        run_once(app, args.batch_size)
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())